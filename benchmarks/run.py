@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import shutil
+import logging
+import platform
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.synthetic import SCALES, Corpus, pair_scores
+from benchmarks.server import StandIn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return f"{sha}-dirty" if dirty else sha
+    except Exception:
+        return "unknown"
+
+
+def run_once(corpus: Corpus, output: Path, engine: str, args) -> Dict[str, Any]:
+    from main import LogoMatcher
+
+    output.mkdir(parents=True, exist_ok=True)
+    websites = output / "websites.txt"
+    websites.write_text("\n".join(corpus.websites()))
+    matcher = LogoMatcher(
+        output,
+        args.workers,
+        args.threshold,
+        engine=engine,
+        cache_dir=output / "cache",
+        batch_size=args.batch_size,
+        decoders=args.decoders,
+        open_report=False,
+    )
+    matcher.run(websites)
+
+    result = json.loads((output / "logo_groups.json").read_text())
+    return {
+        "extracted": result["metadata"]["extracted_logos"],
+        "groups": result["metadata"]["logo_groups_found"],
+        "quality": pair_scores(result["groups"], corpus.truth()),
+        "timings": matcher.timings,
+    }
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Run the pipeline against a local stand-in for the web and Clearbit")
+    p.add_argument("-s", "--scales", nargs="+", choices=list(SCALES), default=["1k"])
+    p.add_argument("-e", "--engines", nargs="+", choices=["threads", "async"], default=["threads", "async"])
+    p.add_argument("-o", "--output", default="bench_output")
+    p.add_argument("-r", "--results", default="bench_results.jsonl", help="JSON lines file results are appended to")
+    p.add_argument("--duplicate-rate", type=float, default=0.2)
+    p.add_argument("--near-rate", type=float, default=0.1)
+    p.add_argument("--slow-delay", type=float, default=2.0, help="Seconds slow hosts wait before every response")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--warm", action="store_true", help="Rerun each case against its warm cache")
+    p.add_argument("-w", "--workers", type=int, default=50)
+    p.add_argument("-t", "--threshold", type=float, default=0.75)
+    p.add_argument("-b", "--batch-size", type=int, default=64)
+    p.add_argument("-d", "--decoders", type=int)
+    args = p.parse_args()
+
+    rows: List[Dict[str, Any]] = []
+    for scale in args.scales:
+        corpus = Corpus(SCALES[scale], args.duplicate_rate, args.near_rate, seed=args.seed)
+        server = StandIn(corpus, delay=args.slow_delay).start()
+        for key in ("HTTP_PROXY", "http_proxy"):
+            os.environ[key] = server.url
+        for key in ("NO_PROXY", "no_proxy"):
+            os.environ[key] = "localhost"
+        os.environ["CLEARBIT_URL"] = f"http://{server.clearbit_host}/{{domain}}"
+
+        for engine in args.engines:
+            output = Path(args.output) / f"{scale}-{engine}"
+            shutil.rmtree(output, ignore_errors=True)
+            for phase in ("cold", "warm") if args.warm else ("cold",):
+                server.served.clear()
+                logger.info(f"{scale} {engine} {phase}: {len(corpus.sites)} sites, {corpus.brands} brands")
+                row = {
+                    "commit": commit(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "machine": {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform()},
+                    "scale": scale,
+                    "sites": len(corpus.sites),
+                    "engine": engine,
+                    "phase": phase,
+                    "config": {k: v for k, v in vars(args).items() if k not in ("scales", "engines", "output", "results")},
+                }
+                row.update(run_once(corpus, output, engine, args))
+                row["served"] = dict(server.served)
+                rows.append(row)
+                with open(args.results, "a") as f:
+                    f.write(json.dumps(row) + "\n")
+        server.close()
+
+    for row in rows:
+        stages = "  ".join(f"{k}={v['wall']:.1f}s" for k, v in row["timings"].items())
+        q = row["quality"]
+        print(
+            f"{row['scale']:>5} {row['engine']:<8} {row['phase']:<5} {stages}  "
+            f"P={q['pair_precision']:.3f} R={q['pair_recall']:.3f} coverage={q['coverage']:.3f}"
+        )
+    logger.info(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
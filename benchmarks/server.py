@@ -0,0 +1,111 @@
+import sys
+import time
+import hashlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic import Corpus
+
+PAGES = {
+    "og": '<html><head><meta property="og:image" content="/static/og.png"></head><body></body></html>',
+    "header": '<html><head></head><body><header><img src="/img/brand-logo.png" alt="Logo" width="180"></header></body></html>',
+    "other": "<html><head></head><body><p>Welcome</p></body></html>",
+}
+LOGO_PATHS = {"og": "/static/og.png", "header": "/img/brand-logo.png", "fallback": "/logo.png"}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+    def _respond(self, body: bool):
+        url = urlsplit(self.path)
+        host = (url.hostname or self.headers.get("Host", "").split(":")[0]).lower()
+        status, content_type, payload = self.server.standin.route(host, url.path)
+
+        etag = f'"{hashlib.blake2b(payload, digest_size=8).hexdigest()}"' if status == 200 else None
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, payload = 304, b""
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+
+class StandIn:
+    def __init__(self, corpus: Corpus, port: int = 0, delay: float = 2.0, clearbit_host: str = "logo.clearbit.com"):
+        self.corpus = corpus
+        self.delay = delay
+        self.clearbit_host = clearbit_host
+        self.served = Counter()
+        self._lock = Lock()
+        self.server = _Server(("127.0.0.1", port), _Handler)
+        self.server.standin = self
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "StandIn":
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route(self, host: str, path: str) -> Tuple[int, str, bytes]:
+        if host == self.clearbit_host:
+            site = self.corpus.sites.get(path.strip("/").lower())
+            found = site is not None and site[0] == "clearbit"
+            self._count("clearbit" if found else "clearbit_miss")
+            return (200, "image/png", self.corpus.logo(site[1], site[2])) if found else (404, "text/plain", b"not found")
+
+        site = self.corpus.sites.get(host.removeprefix("www."))
+        if site is None:
+            return 404, "text/plain", b"not found"
+        kind, brand, variant = site
+        if kind == "fail":
+            self._count("fail")
+            return 503, "text/plain", b"unavailable"
+        if kind == "slow":
+            time.sleep(self.delay)
+            kind = "og"
+
+        if path in ("", "/"):
+            self._count("page")
+            return 200, "text/html", PAGES.get(kind, PAGES["other"]).encode()
+        if path == LOGO_PATHS.get(kind):
+            self._count(kind)
+            return 200, "image/png", self.corpus.logo(brand, variant)
+        self._count("miss")
+        return 404, "text/plain", b"not found"
+
+    def _count(self, key: str):
+        with self._lock:
+            self.served[key] += 1
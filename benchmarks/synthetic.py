@@ -0,0 +1,83 @@
+import io
+import numpy as np
+from collections import Counter
+from functools import lru_cache
+from PIL import Image, ImageDraw
+from typing import Any, Dict, List, Tuple
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+KINDS = {"clearbit": 0.45, "og": 0.25, "header": 0.15, "fallback": 0.05, "slow": 0.05, "fail": 0.05}
+LOGO_SIZE = 192
+
+
+class Corpus:
+    def __init__(
+        self,
+        size: int,
+        duplicate_rate: float = 0.2,
+        near_rate: float = 0.1,
+        kinds: Dict[str, float] = KINDS,
+        seed: int = 0,
+        tld: str = "bench",
+    ):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        names = list(kinds)
+        weights = np.array(list(kinds.values()), dtype=float)
+        drawn = rng.choice(len(names), size=size, p=weights / weights.sum())
+        roll = rng.random(size)
+
+        self.brands = 0
+        self.sites: Dict[str, Tuple[str, int, int]] = {}
+        for i in range(size):
+            if self.brands and roll[i] < duplicate_rate:
+                brand, variant = int(rng.integers(self.brands)), 0
+            elif self.brands and roll[i] < duplicate_rate + near_rate:
+                brand, variant = int(rng.integers(self.brands)), int(rng.integers(1, 4))
+            else:
+                brand, variant = self.brands, 0
+                self.brands += 1
+            self.sites[f"site{i:06d}.{tld}"] = (names[drawn[i]], brand, variant)
+        self.logo = lru_cache(maxsize=4096)(self._logo)
+
+    def websites(self) -> List[str]:
+        return [f"http://{d}" for d in self.sites]
+
+    def truth(self) -> Dict[str, int]:
+        return {f"http://{d}": brand for d, (kind, brand, _) in self.sites.items() if kind != "fail"}
+
+    def _logo(self, brand: int, variant: int) -> bytes:
+        rng = np.random.default_rng([self.seed, brand])
+        img = Image.new("RGB", (LOGO_SIZE, LOGO_SIZE), tuple(rng.integers(0, 256, 3).tolist()))
+        draw = ImageDraw.Draw(img)
+        for _ in range(4):
+            x, y = rng.integers(0, LOGO_SIZE * 2 // 3, 2).tolist()
+            w, h = rng.integers(LOGO_SIZE // 6, LOGO_SIZE // 2, 2).tolist()
+            shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+            shape([x, y, x + w, y + h], fill=tuple(rng.integers(0, 256, 3).tolist()))
+
+        arr = np.asarray(img, dtype=np.int16) + rng.integers(-4, 5, (LOGO_SIZE, LOGO_SIZE, 1))
+        if variant:
+            v = np.random.default_rng([self.seed, brand, variant])
+            arr = np.roll(arr, int(v.integers(1, 4)), axis=int(v.integers(2))) + v.integers(-10, 11, 3)
+
+        buf = io.BytesIO()
+        Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(buf, format="PNG")
+        return buf.getvalue()
+
+
+def pair_scores(groups: List[Dict[str, Any]], truth: Dict[str, int]) -> Dict[str, float]:
+    pred = {w["url"]: g["group_id"] for g in groups for w in g["websites"]}
+
+    def pairs(counts: Counter) -> int:
+        return sum(n * (n - 1) // 2 for n in counts.values())
+
+    found = [w for w in truth if w in pred]
+    tp = pairs(Counter((pred[w], truth[w]) for w in found))
+    predicted = pairs(Counter(pred[w] for w in found))
+    actual = pairs(Counter(truth.values()))
+    return {
+        "coverage": round(len(found) / len(truth), 4) if truth else 1.0,
+        "pair_precision": round(tp / predicted, 4) if predicted else 1.0,
+        "pair_recall": round(tp / actual, 4) if actual else 1.0,
+    }
@@ -0,0 +1,264 @@
+import time
+import asyncio
+import aiohttp
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from fake_useragent import UserAgent
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from extractors.logo_extractor import (
+    CLEARBIT_URL,
+    MAX_PAGE_BYTES,
+    normalize,
+    parse,
+    ranked_candidates,
+)
+from extractors.scheduler import BudgetExhausted, CircuitOpen, Deadline, Scheduler
+from utils.metrics import Metrics
+
+NETWORK_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+class AsyncLogoExtractor:
+    def __init__(
+        self,
+        timeout: int = 10,
+        concurrency: int = 500,
+        per_host: int = 4,
+        clearbit_concurrency: int = 50,
+        metrics: Optional[Metrics] = None,
+        window: int = 6,
+        max_bytes: int = MAX_PAGE_BYTES,
+        scheduler: Optional[Scheduler] = None,
+        speculate: bool = False,
+    ):
+        self.speculate = speculate
+        self.scheduler = scheduler or Scheduler(timeouts={"page": timeout}, metrics=metrics)
+        self.scheduler.exempt(urlparse(CLEARBIT_URL).hostname)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.clearbit_host = urlparse(CLEARBIT_URL).netloc
+        self.clearbit_concurrency = clearbit_concurrency
+        self.metrics = metrics
+        self.window = window
+        self.max_bytes = max_bytes
+        self.ua = UserAgent()
+
+    def extract_all(
+        self,
+        websites: Iterable[str],
+        on_result: Optional[Callable[[str, Optional[Tuple[str, str]]], None]] = None,
+        on_unresolved: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Tuple[str, str]]:
+        return asyncio.run(self._extract_all(websites, on_result, on_unresolved))
+
+    async def _extract_all(self, websites, on_result, on_unresolved) -> Dict[str, Tuple[str, str]]:
+        self._inflight = asyncio.Semaphore(self.concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        logos: Dict[str, Tuple[str, str]] = {}
+        deferred: List[str] = []
+        pending = iter(websites)
+        source = ThreadPoolExecutor(1)
+        loop = asyncio.get_running_loop()
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=0, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector, trust_env=True) as session:
+            async def done(w, r):
+                if r:
+                    logos[w] = r
+                if on_result:
+                    await asyncio.to_thread(on_result, w, r)
+
+            async def worker():
+                while True:
+                    w = await loop.run_in_executor(source, next, pending, None)
+                    if w is None:
+                        return
+                    try:
+                        r = await self.extract(session, w, defer=True)
+                    except (BudgetExhausted, CircuitOpen):
+                        deferred.append(w)
+                        continue
+                    await done(w, r)
+
+            async def retrier(retry):
+                for w in retry:
+                    try:
+                        r = await self.extract(session, w, retry=True)
+                    except CircuitOpen:
+                        if on_unresolved:
+                            await asyncio.to_thread(on_unresolved, w)
+                        continue
+                    await done(w, r)
+
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            retry = iter(deferred)
+            await asyncio.gather(*(retrier(retry) for _ in range(min(self.concurrency, len(deferred)))))
+        source.shutdown()
+        return logos
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            limit = self.clearbit_concurrency if host == self.clearbit_host else self.per_host
+            self._hosts[host] = asyncio.Semaphore(limit)
+        return self._hosts[host]
+
+    async def extract(
+        self,
+        session: aiohttp.ClientSession,
+        website: str,
+        defer: bool = False,
+        retry: bool = False,
+    ) -> Optional[Tuple[str, str]]:
+        start = time.perf_counter()
+        requests_made = Counter()
+        deadline = self.scheduler.deadline(retry)
+        try:
+            found = await asyncio.wait_for(
+                self._extract(session, website, requests_made, deadline), max(deadline.remaining(), 0)
+            )
+        except (asyncio.TimeoutError, BudgetExhausted, CircuitOpen) as e:
+            blocked = isinstance(e, CircuitOpen)
+            if defer or blocked:
+                if self.metrics:
+                    self.metrics.inc("deferred_total" if defer else "unresolved_total")
+                raise e if blocked else BudgetExhausted()
+            found = None
+        if self.metrics:
+            self.metrics.extraction(found, requests_made, time.perf_counter() - start)
+        return found
+
+    async def _extract(
+        self,
+        session: aiohttp.ClientSession,
+        website: str,
+        requests_made: Counter,
+        deadline: Deadline,
+    ) -> Optional[Tuple[str, str]]:
+        target = normalize(website)
+        if not target:
+            return None
+        website, domain = target
+
+        clearbit = CLEARBIT_URL.format(domain=domain)
+        page = None
+        if self.speculate:
+            requests_made["page"] += 1
+            page = asyncio.ensure_future(self._fetch(session, website, deadline))
+        try:
+            if await self._clearbit(session, clearbit, requests_made, deadline):
+                return clearbit, "clearbit"
+            if page is None:
+                requests_made["page"] += 1
+                page = asyncio.ensure_future(self._fetch(session, website, deadline))
+            metas, headers = await asyncio.to_thread(parse, await page, website)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            metas, headers = [], []
+        finally:
+            if page is not None:
+                page.cancel()
+        ranked = ranked_candidates(metas, headers, website)
+        found = await self._first_image(session, [c for c in ranked if c[0] != "fallback"], requests_made, deadline)
+        found = found or await self._first_image(session, [c for c in ranked if c[0] == "fallback"], requests_made, deadline)
+        if not found and (deadline.cut or deadline.expired()):
+            raise BudgetExhausted()
+        if not found and deadline.blocked:
+            raise CircuitOpen(domain)
+        return found
+
+    async def _clearbit(self, session: aiohttp.ClientSession, url: str, requests_made: Counter, deadline: Deadline) -> bool:
+        requests_made["clearbit"] += 1
+        probe = asyncio.ensure_future(self._is_image(session, url, 500, deadline, "clearbit"))
+        delay = self.scheduler.hedge_delay()
+        if delay is None or delay >= deadline.remaining():
+            return await probe
+        done, _ = await asyncio.wait({probe}, timeout=delay)
+        if done:
+            return probe.result()
+
+        requests_made["clearbit"] += 1
+        hedge = asyncio.ensure_future(self._is_image(session, url, 500, deadline, "clearbit"))
+        try:
+            done, _ = await asyncio.wait({probe, hedge}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            probe.cancel()
+            hedge.cancel()
+        winner = probe if probe in done else hedge
+        if self.metrics:
+            self.metrics.inc("hedged_total", winner="hedge" if winner is hedge else "primary")
+        return winner.result()
+
+    async def _first_image(
+        self,
+        session: aiohttp.ClientSession,
+        candidates: List[Tuple[str, str, int]],
+        requests_made: Counter,
+        deadline: Deadline,
+    ) -> Optional[Tuple[str, str]]:
+        tasks: List[asyncio.Task] = []
+
+        def submit():
+            strategy, url, min_size = candidates[len(tasks)]
+            requests_made[strategy] += 1
+            tasks.append(asyncio.ensure_future(self._is_image(session, url, min_size, deadline)))
+
+        while len(tasks) < min(self.window, len(candidates)):
+            submit()
+        try:
+            for n, (strategy, url, _) in enumerate(candidates):
+                if await tasks[n]:
+                    return url, strategy
+                if len(tasks) < len(candidates):
+                    submit()
+        finally:
+            for t in tasks:
+                t.cancel()
+        return None
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, deadline: Optional[Deadline] = None) -> bytes:
+        async with self._host_limit(url), self._inflight:
+            with self.scheduler.attempt("page", url, deadline, NETWORK_ERRORS) as timeout:
+                async with session.get(
+                    url,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                    headers={"User-Agent": self.ua.random},
+                    allow_redirects=True,
+                ) as r:
+                    r.raise_for_status()
+                    content = bytearray()
+                    async for chunk in r.content.iter_chunked(64 * 1024):
+                        content += chunk
+                        if len(content) >= self.max_bytes:
+                            break
+                    return bytes(content[: self.max_bytes])
+
+    async def _is_image(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        min_size: int = 500,
+        deadline: Optional[Deadline] = None,
+        kind: str = "probe",
+    ) -> bool:
+        try:
+            async with self._host_limit(url), self._inflight:
+                with self.scheduler.attempt(kind, url, deadline, NETWORK_ERRORS) as timeout:
+                    async with session.head(
+                        url, timeout=aiohttp.ClientTimeout(total=timeout), allow_redirects=True
+                    ) as r:
+                        if r.status != 200:
+                            return False
+
+                        content_type = r.headers.get("content-type", "").lower()
+                        if "image" not in content_type:
+                            return False
+
+                        size = r.headers.get("content-length")
+                        return not size or int(size) > min_size
+
+        except Exception:
+            return False
@@ -1,105 +1,267 @@
-﻿import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
+﻿import os
+import time
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from urllib.parse import urlparse, urljoin, urlsplit
 from fake_useragent import UserAgent
-from typing import Optional
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
 from requests.adapters import HTTPAdapter
 
+from extractors.scheduler import BudgetExhausted, CircuitOpen, Deadline, Scheduler
+from utils.metrics import Metrics
+
+CLEARBIT_URL = os.environ.get("CLEARBIT_URL", "https://logo.clearbit.com/{domain}")
+FALLBACK_PATHS = ("/logo.png", "/logo.svg", "/images/logo.png", "/favicon.ico")
+MAX_PAGE_BYTES = 512 * 1024
+STRAINER = SoupStrainer(["head", "header", "nav", "meta", "link"])
+NETWORK_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+def normalize(website: str) -> Optional[Tuple[str, str]]:
+    if not website.startswith(("http://", "https://")):
+        website = f"https://{website}"
+
+    try:
+        parsed = urlparse(website)
+        domain = (parsed.netloc or parsed.path.split("/")[0]).replace("www.", "")
+    except Exception:
+        return None
+    return website, domain
+
+
+def domain_key(website: str) -> Optional[str]:
+    target = normalize(website.strip())
+    return target[1].lower() if target else None
+
+
+def meta_candidates(soup: BeautifulSoup, website: str) -> List[Tuple[str, str]]:
+    urls = []
+    for strategy, meta in (
+        ("og:image", soup.find("meta", property="og:image")),
+        ("itemprop", soup.find("meta", attrs={"itemprop": "logo"})),
+        ("apple-touch-icon", soup.find("link", rel="apple-touch-icon")),
+        ("icon", soup.find("link", rel="icon", sizes="256x256")),
+    ):
+        content_attr = meta.get("content") if meta else None
+        href_attr = meta.get("href") if meta else None
+
+        url = content_attr or href_attr
+
+        if url:
+            urls.append((strategy, urljoin(website, url)))
+    return urls
+
+
+def header_candidates(soup: BeautifulSoup, website: str) -> List[Tuple[float, str]]:
+    header = soup.find(["header", "nav"])
+    if not header:
+        return []
+
+    candidates = []
+    for img in header.find_all("img", limit=30):
+        src = img.get("src") or img.get("data-src")
+        if not src:
+            continue
+
+        text = " ".join([
+            img.get("alt", ""),
+            " ".join(img.get("class", [])),
+            src
+        ]).lower()
+
+        score = 0
+        if "logo" in text: score += 10
+        if "brand" in text: score += 5
+
+        w = img.get("width")
+        if w and w.isdigit():
+            score += int(w) / 10
+
+        candidates.append((score, urljoin(website, src)))
+    return candidates
+
+
+def parse(content: bytes, website: str) -> Tuple[List[Tuple[str, str]], List[Tuple[float, str]]]:
+    soup = BeautifulSoup(content, "lxml", parse_only=STRAINER)
+    return meta_candidates(soup, website), header_candidates(soup, website)
+
+
+def ranked_candidates(
+    metas: List[Tuple[str, str]],
+    headers: List[Tuple[float, str]],
+    website: str,
+) -> List[Tuple[str, str, int]]:
+    ranked = [(strategy, url, 2000) for strategy, url in metas]
+    best_first = sorted((-score, n) for n, (score, _) in enumerate(headers) if score > 0)
+    ranked += [("header", headers[n][1], 2000) for _, n in best_first]
+    ranked += [("fallback", urljoin(website, p), 500) for p in FALLBACK_PATHS]
+
+    seen = set()
+    unique = []
+    for strategy, url, min_size in ranked:
+        if (url, min_size) not in seen:
+            seen.add((url, min_size))
+            unique.append((strategy, url, min_size))
+    return unique
+
+
 class LogoExtractor:
-    def __init__(self, timeout: int = 10, workers: int = 20):
-        self.timeout = timeout
+    def __init__(
+        self,
+        timeout: int = 10,
+        workers: int = 20,
+        metrics: Optional[Metrics] = None,
+        window: int = 6,
+        max_bytes: int = MAX_PAGE_BYTES,
+        scheduler: Optional[Scheduler] = None,
+        speculate: bool = False,
+    ):
+        self.metrics = metrics
+        self.speculate = speculate
+        self.scheduler = scheduler or Scheduler(timeouts={"page": timeout}, metrics=metrics)
+        self.scheduler.exempt(urlsplit(CLEARBIT_URL).hostname)
+        self.window = window
+        self.max_bytes = max_bytes
+        self.pool = ThreadPoolExecutor(workers * window)
         self.session = requests.Session()
-        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers * window)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
         self.ua = UserAgent()
 
     def extract(self, website: str) -> Optional[str]:
-        if not website.startswith(("http://", "https://")):
-            website = f"https://{website}"
+        found = self.extract_with_strategy(website)
+        return found[0] if found else None
 
+    def extract_with_strategy(self, website: str, defer: bool = False, retry: bool = False) -> Optional[Tuple[str, str]]:
+        start = time.perf_counter()
+        requests_made = Counter()
+        deadline = self.scheduler.deadline(retry)
         try:
-            parsed = urlparse(website)
-            domain = (parsed.netloc or parsed.path.split("/")[0]).replace("www.", "")
-        except Exception:
+            found = self._extract(website, requests_made, deadline)
+        except (BudgetExhausted, CircuitOpen) as e:
+            if defer or isinstance(e, CircuitOpen):
+                if self.metrics:
+                    self.metrics.inc("deferred_total" if defer else "unresolved_total")
+                raise
+            found = None
+        if self.metrics:
+            self.metrics.extraction(found, requests_made, time.perf_counter() - start)
+        return found
+
+    def _extract(self, website: str, requests_made: Counter, deadline: Deadline) -> Optional[Tuple[str, str]]:
+        target = normalize(website)
+        if not target:
             return None
+        website, domain = target
 
-        clearbit = f"https://logo.clearbit.com/{domain}"
-        if self._is_image(clearbit):
-            return clearbit
+        clearbit = CLEARBIT_URL.format(domain=domain)
+        page = None
+        if self.speculate:
+            requests_made["page"] += 1
+            page = self.pool.submit(self._fetch, website, deadline)
+        if self._clearbit(clearbit, requests_made, deadline):
+            if page is not None and page.cancel():
+                requests_made["page"] -= 1
+            return clearbit, "clearbit"
+        if page is None:
+            requests_made["page"] += 1
+            page = self.pool.submit(self._fetch, website, deadline)
 
         try:
-            r = self.session.get(
-                website,
-                timeout=self.timeout,
-                headers={"User-Agent": self.ua.random},
-                allow_redirects=True,
-            )
+            metas, headers = parse(page.result(timeout=max(deadline.remaining(), 0)), website)
+        except FutureTimeout:
+            raise BudgetExhausted()
+        except Exception:
+            metas, headers = [], []
+        ranked = ranked_candidates(metas, headers, website)
+        found = self._first_image([c for c in ranked if c[0] != "fallback"], requests_made, deadline)
+        found = found or self._first_image([c for c in ranked if c[0] == "fallback"], requests_made, deadline)
+        if not found and (deadline.cut or deadline.expired()):
+            raise BudgetExhausted()
+        if not found and deadline.blocked:
+            raise CircuitOpen(domain)
+        return found
+
+    def _clearbit(self, url: str, requests_made: Counter, deadline: Deadline) -> bool:
+        requests_made["clearbit"] += 1
+        probe = self.pool.submit(self._is_image, url, 500, deadline, "clearbit")
+        delay = self.scheduler.hedge_delay()
+        try:
+            if delay is None or delay >= deadline.remaining():
+                return probe.result(timeout=max(deadline.remaining(), 0))
+            done, _ = wait([probe], timeout=delay)
+            if done:
+                return probe.result()
+
+            requests_made["clearbit"] += 1
+            hedge = self.pool.submit(self._is_image, url, 500, deadline, "clearbit")
+            done, _ = wait([probe, hedge], timeout=max(deadline.remaining(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                raise BudgetExhausted()
+            winner = probe if probe in done else hedge
+            (hedge if winner is probe else probe).cancel()
+            if self.metrics:
+                self.metrics.inc("hedged_total", winner="hedge" if winner is hedge else "primary")
+            return winner.result()
+        except FutureTimeout:
+            raise BudgetExhausted()
+
+    def _fetch(self, url: str, deadline: Optional[Deadline] = None) -> bytes:
+        with self.scheduler.attempt("page", url, deadline, NETWORK_ERRORS) as timeout, self.session.get(
+            url,
+            timeout=timeout,
+            headers={"User-Agent": self.ua.random},
+            allow_redirects=True,
+            stream=True,
+        ) as r:
             r.raise_for_status()
-            soup = BeautifulSoup(r.content, "html.parser")
-
-            for meta in (
-                soup.find("meta", property="og:image"),
-                soup.find("meta", attrs={"itemprop": "logo"}),
-                soup.find("link", rel="apple-touch-icon"),
-                soup.find("link", rel="icon", sizes="256x256"),
-            ):
-                content_attr = meta.get("content") if meta else None
-                href_attr = meta.get("href") if meta else None
-                
-                url = content_attr or href_attr
-
-                if url:
-                    full_url = urljoin(website, url)
-                    if self._is_image(full_url, min_size=2000):
-                        return full_url
-
-            header = soup.find(["header", "nav"])
-            if header:
-                best = None
-                best_score = 0
-                for img in header.find_all("img", limit=30):
-                    src = img.get("src") or img.get("data-src")
-                    if not src:
-                        continue
-                        
-                    text = " ".join([
-                        img.get("alt", ""),
-                        " ".join(img.get("class", [])),
-                        src
-                    ]).lower()
-                    
-                    score = 0
-                    if "logo" in text: score += 10
-                    if "brand" in text: score += 5
-                    
-                    w = img.get("width")
-                    if w and w.isdigit():
-                        score += int(w) / 10
-                        
-                    if score > best_score:
-                        full_url = urljoin(website, src)
-                        if self._is_image(full_url, min_size=2000):
-                            best_score = score
-                            best = src
-                        
-                if best:
-                    return urljoin(website, best)
+            content = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                content += chunk
+                if len(content) >= self.max_bytes:
+                    break
+                if deadline and deadline.expired():
+                    raise BudgetExhausted()
+            return bytes(content[: self.max_bytes])
 
-        except Exception:
-            pass
+    def _first_image(
+        self,
+        candidates: List[Tuple[str, str, int]],
+        requests_made: Counter,
+        deadline: Deadline,
+    ) -> Optional[Tuple[str, str]]:
+        futures: List[Future] = []
 
-        for p in ("/logo.png", "/logo.svg", "/images/logo.png", "/favicon.ico"):
-            url = urljoin(website, p)
-            if self._is_image(url):
-                return url
+        def submit():
+            strategy, url, min_size = candidates[len(futures)]
+            requests_made[strategy] += 1
+            futures.append(self.pool.submit(self._is_image, url, min_size, deadline))
 
+        while len(futures) < min(self.window, len(candidates)):
+            submit()
+        try:
+            for n, (strategy, url, _) in enumerate(candidates):
+                if futures[n].result(timeout=max(deadline.remaining(), 0)):
+                    return url, strategy
+                if len(futures) < len(candidates):
+                    submit()
+        except FutureTimeout:
+            raise BudgetExhausted()
+        finally:
+            for (strategy, _, _), f in zip(candidates, futures):
+                if f.cancel():
+                    requests_made[strategy] -= 1
         return None
 
-    def _is_image(self, url: str, min_size: int = 500) -> bool:
+    def _is_image(self, url: str, min_size: int = 500, deadline: Optional[Deadline] = None, kind: str = "probe") -> bool:
         try:
-            r = self.session.head(url, timeout=5, allow_redirects=True)
+            with self.scheduler.attempt(kind, url, deadline, NETWORK_ERRORS) as timeout:
+                r = self.session.head(url, timeout=timeout, allow_redirects=True)
             if r.status_code != 200:
                 return False
             
@@ -114,4 +276,5 @@ class LogoExtractor:
             return False
 
     def close(self):
+        self.pool.shutdown(cancel_futures=True)
         self.session.close()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import time
+import numpy as np
+from contextlib import contextmanager
+from threading import Lock
+from urllib.parse import urlsplit
+from typing import Dict, Iterator, Optional, Set, Tuple, Type
+
+from utils.metrics import Metrics
+
+TIMEOUTS = {"page": 10.0, "probe": 5.0, "clearbit": 5.0, "download": 10.0}
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, budget: float, adaptive: bool = True):
+        self.end = time.perf_counter() + budget
+        self.adaptive = adaptive
+        self.cut = False
+        self.blocked = False
+
+    def remaining(self) -> float:
+        return self.end - time.perf_counter()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 1024):
+        self.samples = np.zeros(size)
+        self.count = 0
+        self.lock = Lock()
+
+    def observe(self, seconds: float):
+        with self.lock:
+            self.samples[self.count % len(self.samples)] = seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        with self.lock:
+            return float(np.quantile(self.samples[: min(self.count, len(self.samples))], q))
+
+
+class Scheduler:
+    def __init__(
+        self,
+        budget: float = 15.0,
+        retry_budget: float = 60.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        quantile: float = 0.99,
+        factor: float = 2.0,
+        floor: float = 1.0,
+        min_samples: int = 50,
+        failures: int = 3,
+        cooldown: float = 30.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.9,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.budget = budget
+        self.retry_budget = retry_budget
+        self.ceilings = {**TIMEOUTS, **(timeouts or {})}
+        self.quantile = quantile
+        self.factor = factor
+        self.floor = floor
+        self.min_samples = min_samples
+        self.failures = failures
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.metrics = metrics
+        self.latency = {kind: LatencyWindow() for kind in self.ceilings}
+        self.hosts: Dict[str, list] = {}
+        self.shared: Set[str] = set()
+        self.lock = Lock()
+
+    def deadline(self, retry: bool = False) -> Deadline:
+        return Deadline(self.retry_budget if retry else self.budget, adaptive=not retry)
+
+    def adaptive(self, kind: str) -> float:
+        ceiling = self.ceilings[kind]
+        window = self.latency[kind]
+        if window.count < self.min_samples:
+            return ceiling
+        return min(ceiling, max(self.floor, self.factor * window.quantile(self.quantile)))
+
+    def timeout(self, kind: str, deadline: Optional[Deadline] = None) -> float:
+        if deadline is None:
+            return self.adaptive(kind)
+        timeout = self.adaptive(kind) if deadline.adaptive else self.ceilings[kind]
+        remaining = deadline.remaining()
+        if remaining < 0.05:
+            raise BudgetExhausted()
+        return min(timeout, remaining)
+
+    def hedge_delay(self) -> Optional[float]:
+        window = self.latency["clearbit"]
+        if not self.hedge or window.count < self.min_samples:
+            return None
+        return window.quantile(self.hedge_quantile)
+
+    def exempt(self, host: str):
+        self.shared.add(host)
+
+    def allow(self, host: str) -> bool:
+        if host in self.shared:
+            return True
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None or state[0] < self.failures:
+                return True
+            if time.monotonic() - state[1] < self.cooldown:
+                return False
+            state[1] = time.monotonic()
+            return True
+
+    def _record(self, host: str, ok: bool):
+        if host in self.shared:
+            return
+        with self.lock:
+            if ok:
+                self.hosts.pop(host, None)
+                return
+            state = self.hosts.setdefault(host, [0, 0.0])
+            opened = state[0] >= self.failures
+            state[0] += 1
+            if state[0] >= self.failures:
+                state[1] = time.monotonic()
+                if not opened and self.metrics:
+                    self.metrics.inc("circuit_opened_total")
+
+    @contextmanager
+    def attempt(
+        self,
+        kind: str,
+        url: str,
+        deadline: Optional[Deadline] = None,
+        failures: Tuple[Type[BaseException], ...] = (Exception,),
+    ) -> Iterator[float]:
+        host = urlsplit(url).hostname or ""
+        if not self.allow(host):
+            if self.metrics:
+                self.metrics.inc("circuit_rejected_total", kind=kind)
+            if deadline is not None:
+                deadline.blocked = True
+            raise CircuitOpen(host)
+        timeout = self.timeout(kind, deadline)
+        start = time.perf_counter()
+        try:
+            yield timeout
+        except failures:
+            timed_out = time.perf_counter() - start >= 0.9 * timeout
+            if deadline is not None and timed_out and timeout < self.ceilings[kind]:
+                deadline.cut = True
+            else:
+                self._record(host, ok=False)
+            raise
+        self._record(host, ok=True)
+        self.latency[kind].observe(time.perf_counter() - start)
+
+    def publish(self):
+        if not self.metrics:
+            return
+        for kind, window in self.latency.items():
+            self.metrics.set("adaptive_timeout_seconds", round(self.adaptive(kind), 3), kind=kind)
+            if window.count:
+                self.metrics.set("request_p99_seconds", round(window.quantile(0.99), 3), kind=kind)
+        with self.lock:
+            opened = sum(1 for failures, _ in self.hosts.values() if failures >= self.failures)
+        self.metrics.set("circuit_open_hosts", opened)
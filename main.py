@@ -1,123 +1,458 @@
-﻿import json
+﻿import os
+import json
 import time
 import logging
-import pandas as pd
+import numpy as np
 import webbrowser
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, islice
+from threading import Lock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from PIL import Image
 from tqdm import tqdm
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
 from extractors.logo_extractor import LogoExtractor
-from processors.image_processor import ImageProcessor
-from matchers.similarity_matcher import SimilarityMatcher
+from extractors.async_logo_extractor import AsyncLogoExtractor
+from extractors.scheduler import BudgetExhausted, CircuitOpen, Scheduler
+from processors.image_processor import ImageProcessor, dominant_color, normalize
+from processors.hash_index import PREFILTER, HashPrefilter
+from matchers.embedding_store import EmbeddingStore
 from utils.visualizer import Visualizer
+from utils.logo_cache import LogoCache, DAY
+from utils.pipeline import Stage, batched
+from utils.metrics import COUNT_BUCKETS, Metrics
+from utils.data_reader import DataReader, parse_shard
+from utils import shards
+from utils.writers import WRITERS
 
 logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
 logger = logging.getLogger("logo-matcher")
 
 class LogoMatcher:
-    def __init__(self, output: Path, workers: int, threshold: float):
+    def __init__(
+        self,
+        output: Path,
+        workers: int,
+        threshold: float,
+        engine: str = "threads",
+        concurrency: int = 500,
+        per_host: int = 4,
+        cache_dir: Optional[Path] = None,
+        cache_ttl: float = 7,
+        negative_ttl: float = 1,
+        batch_size: int = 64,
+        queue_size: int = 1000,
+        embedding_dtype: str = "float32",
+        neighbors: str = "exact",
+        lsh_bits: Optional[int] = None,
+        lsh_tables: Optional[int] = None,
+        recall_sample: int = 0,
+        hash_radius: Optional[int] = 4,
+        decoders: Optional[int] = None,
+        threads: Optional[int] = None,
+        precision: str = "float32",
+        drift_sample: int = 256,
+        open_report: bool = True,
+        prometheus: bool = False,
+        shard: Optional[Tuple[int, int]] = None,
+        formats: Tuple[str, ...] = ("json",),
+        budget: float = 15.0,
+        retry_budget: float = 60.0,
+        hedge: bool = False,
+        speculate: bool = False,
+        sweep: Tuple[float, ...] = (),
+        sweep_color: Tuple[float, ...] = (),
+    ):
         self.output = output
         self.workers = workers
         self.threshold = threshold 
+        self.engine = engine
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.decoders = decoders or os.cpu_count() or 1
+        self.drift_sample = drift_sample
+        self.open_report = open_report
+        self.timings: Dict[str, Any] = {}
+        self.prometheus = prometheus
+        self.shard = shard
+        self.formats = formats
+        self.sweep = sweep
+        self.sweep_color = sweep_color
+        self.metrics = Metrics()
         self.images = output / "images"
 
         self.output.mkdir(exist_ok=True)
         self.images.mkdir(exist_ok=True)
-        self.extractor = LogoExtractor(workers=workers)
-        self.processor = ImageProcessor(self.images)
-        self.matcher = SimilarityMatcher(threshold=self.threshold)
+        self.scheduler = Scheduler(budget, retry_budget, hedge=hedge, metrics=self.metrics)
+        self.extractor = LogoExtractor(workers=workers, metrics=self.metrics, scheduler=self.scheduler, speculate=speculate)
+        self.async_extractor = AsyncLogoExtractor(
+            concurrency=concurrency, per_host=per_host, metrics=self.metrics, scheduler=self.scheduler, speculate=speculate
+        )
+        self.processor = ImageProcessor(self.images, cache_dir / "images" if cache_dir else None, self.scheduler, workers)
+        self.store = EmbeddingStore(cache_dir / "embeddings", embedding_dtype) if cache_dir else None
+        self.partial = shards.shard_dir(output, shard) if shard else None
+        if self.partial:
+            shards.start(self.partial)
+            self.store = EmbeddingStore(self.partial / "embeddings", embedding_dtype)
+        # Imported here so decoder processes, which re-import this module under spawn, don't load torch
+        from matchers.similarity_matcher import SimilarityMatcher
+
+        self.matcher = SimilarityMatcher(
+            threshold=self.threshold,
+            store=self.store,
+            neighbors=neighbors,
+            lsh_bits=lsh_bits,
+            lsh_tables=lsh_tables,
+            recall_sample=recall_sample,
+            batch_size=batch_size,
+            threads=threads,
+            precision=precision,
+            metrics=self.metrics,
+        )
+        self.hash_radius = hash_radius
         self.visualizer = Visualizer(self.output)
+        self.cache = (
+            LogoCache(cache_dir / "logos", ttl=cache_ttl * DAY, negative_ttl=negative_ttl * DAY)
+            if cache_dir
+            else None
+        )
 
-    def load(self, path: Path) -> List[str]:
+    def load(self, path: Path) -> Iterator[str]:
         if not path.exists():
-            return []
-        try:
-            if path.suffix == ".parquet":
-                return pd.read_parquet(path).iloc[:, 0].dropna().unique().tolist()
-            if path.suffix == ".csv":
-                return pd.read_csv(path).iloc[:, 0].dropna().unique().tolist()
-            return [l.strip() for l in path.read_text().splitlines() if l.strip()]
-        except Exception:
-            return []
-
-    def save(self, groups: List[List[str]], logos: Dict[str, str], total: int):
-        formatted_groups = [
-            {
-                "group_id": f"group_{i+1}",
-                "size": len(g),
-                "websites": [{"url": w, "logo_url": logos.get(w, "")} for w in g],
-            }
-            for i, g in enumerate(groups)
-        ]
+            return iter(())
+        return DataReader.stream(path, shard=self.shard)
 
-        out: Dict[str, Any] = {
-            "metadata": {
-                "total_input_websites": total,
-                "extracted_logos": len(logos),
-                "logo_groups_found": len(groups),
-                "cnn_threshold": self.matcher.threshold,
-                "color_threshold": self.matcher.color_threshold,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            },
-            "groups": formatted_groups,
+    def save(self, groups: List[List[str]], logos: Dict[str, str], total: int, image_map: Dict[str, Path]):
+        def formatted_groups() -> Iterator[Dict[str, Any]]:
+            for i, g in enumerate(groups):
+                yield {
+                    "group_id": f"group_{i+1}",
+                    "size": len(g),
+                    "websites": [
+                        {"url": w, "logo_url": logos.get(w, ""), "image_hash": image_map[w].stem}
+                        for w in g
+                    ],
+                }
+
+        metadata: Dict[str, Any] = {
+            "total_input_websites": total,
+            "extracted_logos": len(logos),
+            "logo_groups_found": len(groups),
+            "cnn_threshold": self.matcher.threshold,
+            "color_threshold": self.matcher.color_threshold,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
 
-        (self.output / "logo_groups.json").write_text(json.dumps(out, indent=2))
-        logger.info(f"Results saved to {self.output / 'logo_groups.json'}")
+        writers = [WRITERS[f](self.output, metadata) for f in self.formats]
+        for group in formatted_groups():
+            for writer in writers:
+                writer.write(group)
+        for writer in writers:
+            writer.close()
+        files = [w.name for w in writers]
+        (self.output / "logo_groups.meta.json").write_text(json.dumps({**metadata, "files": files}, indent=2))
+        logger.info(f"Results saved to {self.output}: {', '.join(files)}")
         
-        report_file = self.visualizer.generate([[g] for g in formatted_groups], total)
+        report_file = self.visualizer.generate(formatted_groups(), total)
         logger.info(f"Visual report generated: {report_file}")
-        
+        if not self.open_report:
+            return
+
         try:
             webbrowser.open(report_file.absolute().as_uri()) 
         except Exception as e:
             logger.error(f"Could not open browser automatically: {e}")
 
+    def group(self, encodings: Dict[str, np.ndarray], rep_map: Dict[str, Path]) -> List[List[str]]:
+        if not self.sweep:
+            return self.matcher.group(encodings, rep_map)
+
+        colors = list(self.sweep_color or (self.matcher.color_threshold,))
+        groups, results = self.matcher.sweep(encodings, rep_map, list(self.sweep), colors)
+        path = self.output / "threshold_sweep.json"
+        path.write_text(json.dumps(results, indent=2))
+        for r in results:
+            logger.info(
+                f"cnn >= {r['cnn_threshold']:g}, color >= {r['color_threshold']:g}: {r['groups']} groups, "
+                f"{r['multi_site_groups']} with 2+ sites, largest {r['largest']}"
+            )
+        logger.info(f"Threshold sweep saved to {path}")
+        return groups
+
+    def write_metrics(self):
+        self.metrics.stages(self.timings)
+        self.scheduler.publish()
+        encoder = self.matcher.encoder
+        self.metrics.set("encoded_images", encoder.images)
+        self.metrics.set("encode_throughput", round(encoder.throughput, 3))
+        path = self.metrics.write(self.partial or self.output, self.prometheus)
+        logger.info(f"Metrics saved to {path}")
+
     def run(self, path: Path):
         start = time.time()
         websites = self.load(path)
-        total_websites = len(websites)
-        
-        if not websites:
+        first = next(websites, None)
+        if first is None:
+            if self.partial:
+                shards.finish(self.partial, {"shard": list(self.shard), "total": 0, "websites": {}})
             return
+        websites = chain([first], websites)
+        expected = DataReader.rows(path)
+        if expected and self.shard:
+            expected //= self.shard[1]
 
         logos: Dict[str, str] = {}
-        with ThreadPoolExecutor(self.workers) as ex:
-            futures = {ex.submit(self.extractor.extract, w): w for w in websites}
-            for f in tqdm(as_completed(futures), total=total_websites, desc="1/3 Extracting"):
-                w = futures[f]
-                r = f.result()
-                if r:
-                    logos[w] = r
-        self.extractor.close() 
-
         image_map: Dict[str, Path] = {}
-        download_targets = logos.items() 
-        
-        with ThreadPoolExecutor(self.workers) as ex:
-            futures = {
-                ex.submit(self.processor.download, w, u): w
-                for w, u in download_targets
-            }
-            for f in tqdm(as_completed(futures), total=len(download_targets), desc="2/3 Downloading"):
-                w = futures[f]
-                p = f.result()
-                if p:
-                    image_map[w] = p
-        
+        rep_map: Dict[str, Path] = {}
+        encodings: Dict[str, np.ndarray] = {}
+        queued = set()
+        unresolved_sites: List[str] = []
+        lock = Lock()
+        bars = [
+            tqdm(total=expected, desc="1/3 Extracting", position=0),
+            tqdm(desc="2/3 Downloading", position=1),
+            tqdm(desc="3/3 Encoding", position=2),
+        ]
+
+        def encode(items):
+            if not self.matcher.encoder.calibrated:
+                items = iter(items)
+                head = list(islice(items, self.drift_sample or self.batch_size))
+                self.matcher.calibrate([p for p, _ in head], [a for _, a in head])
+                items = chain(head, items)
+            for batch in batched(items, self.batch_size):
+                paths, arrays = zip(*batch)
+                with self.metrics.timer("encode_batch_seconds"):
+                    encodings.update(self.matcher.encode_files(list(paths), list(arrays)))
+                self.metrics.observe("encode_batch_size", len(batch), COUNT_BUCKETS + (32, 64, 128, 256))
+                bars[2].update(len(batch))
+
+        def add_image(w, digest, arr):
+            p = self.processor.path(digest)
+            image_map[w] = p
+            img = Image.fromarray(arr) if arr is not None else None
+            if img is not None and digest not in self.matcher.color_cache:
+                self.matcher.color_cache[digest] = dominant_color(img)
+            rep = prefilter.representative(p, img) if prefilter else p
+            rep_map[w] = rep
+            with lock:
+                if rep.stem in queued:
+                    return
+                queued.add(rep.stem)
+            encoder.put((rep, arr if rep == p else None))
+
+        def download(item):
+            w, url = item
+            with self.metrics.timer("download_seconds"):
+                fetched = self.processor.fetch(w, url)
+            self.metrics.inc("http_requests_total", kind="download")
+            bars[1].update()
+            if not fetched:
+                self.metrics.inc("downloads_total", result="error")
+                return
+            digest, content, validators = fetched
+            if content is None:
+                self.metrics.inc("downloads_total", result="not_modified")
+                add_image(w, digest, None)
+            else:
+                self.metrics.inc("downloads_total", result="ok")
+                decoder.put((w, url, content, validators))
+
+        def decode(item):
+            w, url, content, validators = item
+            with self.metrics.timer("decode_seconds"):
+                canonical = pool.submit(normalize, content, self.images).result()
+            if not canonical:
+                self.metrics.inc("decode_total", result="rejected")
+                return
+            self.metrics.inc("decode_total", result="ok")
+            digest, arr = canonical
+            self.processor.remember(w, url, digest, validators)
+            add_image(w, digest, arr)
+
+        def found(w, r):
+            if r:
+                logos[w] = r[0]
+                downloader.put((w, r[0]))
+            bars[0].update()
+
+        def extracted(w, r):
+            if self.cache:
+                self.cache.put(w, r)
+            found(w, r)
+
+        def unresolved(w):
+            unresolved_sites.append(w)
+            found(w, None)
+
+        def extract(w):
+            try:
+                r = self.extractor.extract_with_strategy(w, defer=True)
+            except (BudgetExhausted, CircuitOpen):
+                retrier.put(w)
+                return
+            extracted(w, r)
+
+        def retried(w):
+            try:
+                return self.extractor.extract_with_strategy(w, retry=True), True
+            except CircuitOpen:
+                return None, False
+
+        def retry(items):
+            deferred = list(items)
+            if deferred:
+                logger.info(f"Retrying {len(deferred)} domains that ran out of time or hit an open circuit, with a {self.scheduler.retry_budget:g}s budget")
+            with ThreadPoolExecutor(self.workers) as retries:
+                for w, (r, resolved) in zip(deferred, retries.map(retried, deferred)):
+                    if resolved:
+                        extracted(w, r)
+                    else:
+                        unresolved(w)
+
+        prefilter = None
+        if self.hash_radius is not None:
+            prefilter = HashPrefilter(
+                radius=self.hash_radius,
+                same_color=lambda a, b: self.matcher.color_similarity(a, b) >= self.matcher.color_threshold,
+                path=self.store.directory / PREFILTER if self.store is not None else None,
+            )
+
+        pool = ProcessPoolExecutor(self.decoders, mp_context=get_context("spawn"))
+        encoder = Stage(encode, size=4 * self.batch_size, stream=True).start()
+        decoder = Stage(decode, self.decoders, self.queue_size, outbox=encoder).start()
+        downloader = Stage(download, self.workers, self.queue_size, outbox=decoder).start()
+        retrier = None
+        if self.engine == "async":
+            extractor = Stage(
+                lambda items: self.async_extractor.extract_all(items, extracted, unresolved),
+                size=self.queue_size,
+                outbox=downloader,
+                stream=True,
+            ).start()
+        else:
+            retrier = Stage(retry, outbox=downloader, stream=True).start()
+            extractor = Stage(extract, self.workers, self.queue_size, outbox=retrier).start()
+
+        hits = 0
+        total_websites = 0
+        for w in websites:
+            total_websites += 1
+            hit = self.cache.get(w) if self.cache else None
+            if hit is None:
+                extractor.put(w)
+            else:
+                self.metrics.inc("extract_total", strategy=f"cache:{hit[1] or 'none'}")
+                hits += 1
+                found(w, hit if hit[0] else None)
+        extractor.close()
+        bars[0].total = total_websites
+        bars[0].refresh()
+
+        stages = {"extract": extractor, "retry": retrier, "download": downloader, "decode": decoder, "encode": encoder}
+        stages = {name: stage for name, stage in stages.items() if stage is not None}
+        for stage in stages.values():
+            stage.join()
+        self.timings = {name: stage.stats() for name, stage in stages.items()}
+        pool.shutdown()
+        for bar in bars:
+            bar.close()
+        self.extractor.close()
         self.processor.close()
+        if self.store is not None:
+            self.store.flush()
+        if prefilter:
+            prefilter.save()
+        if unresolved_sites:
+            logger.warning(f"{len(unresolved_sites)} domains still hit an open circuit in the retry pass and were not cached")
+        if self.cache:
+            self.cache.close()
+            logger.info(f"Logo cache: {hits} hits, {total_websites - hits} extracted")
+        if prefilter:
+            logger.info(f"Hash prefilter: {prefilter.stats()[0]} images, {len(queued)} sent to the CNN")
+        encoder = self.matcher.encoder
+        if encoder.images:
+            self.timings["encode"]["inference"] = round(encoder.seconds, 3)
+            logger.info(f"Encoded {encoder.images} images at {encoder.throughput:.1f} img/s ({encoder.precision})")
+        if encoder.precision != "float32" and self.drift_sample:
+            sample = [self.processor.path(k) for k in list(encodings)[: self.drift_sample]]
+            drift = encoder.drift([np.asarray(Image.open(p).convert("RGB")) for p in sample])
+            logger.info(f"{encoder.precision} drift vs float32: {drift}")
 
-        if not image_map:
-             self.save([], logos, total_websites)
+        if self.partial:
+            shards.finish(self.partial, {
+                "shard": list(self.shard),
+                "total": total_websites,
+                "websites": {
+                    w: [url, image_map[w].stem if w in image_map else None, rep_map[w].stem if w in rep_map else None]
+                    for w, url in logos.items()
+                },
+                "timings": self.timings,
+            })
+            self.timings["total"] = {"items": total_websites, "wall": round(time.time() - start, 3)}
+            self.write_metrics()
+            logger.info(f"Shard {self.shard[0]}/{self.shard[1]} done in {time.time() - start:.1f}s")
+            return
+
+        if not encodings:
+             self.save([], logos, total_websites, image_map)
+             self.write_metrics()
              return
              
-        enc = self.matcher.encode(self.images)
-        dup = self.matcher.find_duplicates(enc)
-        groups = self.matcher.cluster(dup, image_map)
+        t = time.time()
+        groups = self.group(encodings, rep_map)
+        self.timings["group"] = {"items": len(encodings), "wall": round(time.time() - t, 3)}
 
-        self.save(groups, logos, total_websites)
+        t = time.time()
+        self.save(groups, logos, total_websites, image_map)
+        self.timings["save"] = {"items": len(groups), "wall": round(time.time() - t, 3)}
+        self.timings["total"] = {"items": total_websites, "wall": round(time.time() - start, 3)}
+        self.write_metrics()
+        logger.info(f"Done in {time.time() - start:.1f}s")
+
+    def merge(self, wait: float = 0.0):
+        start = time.time()
+        done = shards.collect(self.output, wait)
+        if not done:
+            return
+
+        logos: Dict[str, str] = {}
+        image_map: Dict[str, Path] = {}
+        rep_map: Dict[str, Path] = {}
+        total = 0
+        store = None
+        for d in done:
+            partial = shards.load(d)
+            total += partial["total"]
+            for w, (url, digest, rep) in partial["websites"].items():
+                logos[w] = url
+                if digest:
+                    image_map[w] = self.processor.path(digest)
+                    rep_map[w] = self.processor.path(rep or digest)
+
+            shard_store = EmbeddingStore(d / "embeddings")
+            if store is None:
+                store = EmbeddingStore(self.output / "shards" / "merged", shard_store.dtype.name)
+            for keys in batched(store.missing(shard_store.ids), 65536):
+                rows = shard_store.indices(keys)
+                store.add(keys, shard_store.matrix[rows], shard_store.colors[rows])
+        store.flush()
+        self.timings["load"] = {"items": total, "wall": round(time.time() - start, 3)}
+        logger.info(f"Merged {len(done)} shards: {total} websites, {len(logos)} logos, {len(store)} embeddings")
+
+        self.store = self.matcher.store = store
+        encodings = store.vectors({p.stem for p in rep_map.values()})
+        t = time.time()
+        groups = self.group(encodings, rep_map) if encodings else []
+        self.timings["group"] = {"items": len(encodings), "wall": round(time.time() - t, 3)}
+
+        t = time.time()
+        self.save(groups, logos, total, image_map)
+        self.timings["save"] = {"items": len(groups), "wall": round(time.time() - t, 3)}
+        self.timings["total"] = {"items": total, "wall": round(time.time() - start, 3)}
+        self.write_metrics()
         logger.info(f"Done in {time.time() - start:.1f}s")
 
 def main():
@@ -128,9 +463,76 @@ def main():
     p.add_argument("-o", "--output", default="output")
     p.add_argument("-w", "--workers", type=int, default=20)
     p.add_argument("-t", "--threshold", type=float, default=0.75) 
+    p.add_argument("-e", "--engine", choices=["threads", "async"], default="threads")
+    p.add_argument("--concurrency", type=int, default=500)
+    p.add_argument("--per-host", type=int, default=4)
+    p.add_argument("--budget", type=float, default=15, help="Seconds per domain before it moves to the retry pass")
+    p.add_argument("--retry-budget", type=float, default=60, help="Seconds per domain in the retry pass")
+    p.add_argument("--hedge", action="store_true", help="Send a second Clearbit probe when the first is slower than p90")
+    p.add_argument("--speculate", action="store_true", help="Fetch each homepage while its Clearbit probe is in flight")
+    p.add_argument("-d", "--decoders", type=int, help="Processes decoding images (defaults to CPU count)")
+    p.add_argument("-b", "--batch-size", type=int, default=64, help="Images per CNN encode batch")
+    p.add_argument("--threads", type=int, help="Intra-op threads for CNN inference")
+    p.add_argument("--precision", choices=["float32", "float16", "bfloat16", "int8"], default="float32")
+    p.add_argument("--drift-sample", type=int, default=256, help="Images used to calibrate int8 and report reduced-precision drift (0 disables drift)")
+    p.add_argument("--queue-size", type=int, default=1000, help="Bound on items waiting between stages")
+    p.add_argument("-n", "--neighbors", choices=["exact", "approx"], default="exact", help="Tiled exact search or LSH")
+    p.add_argument("--lsh-bits", type=int, help="Hyperplanes per LSH table (defaults to log2 of images / 256)")
+    p.add_argument("--lsh-tables", type=int, help="LSH tables (defaults to enough for 0.9 recall at -t, up to 32)")
+    p.add_argument("--recall-sample", type=int, default=0, help="Check -n approx against exact search for this many images")
+    p.add_argument("--sweep", type=float, nargs="+", default=[], help="Also group at each of these CNN thresholds, from the same search (holds ~40 bytes per candidate edge at the loosest threshold)")
+    p.add_argument("--sweep-color", type=float, nargs="+", default=[], help="Colour thresholds for --sweep (defaults to 0.6)")
+    p.add_argument("--hash-radius", type=int, default=4, help="Hamming radius for the near-duplicate hash prefilter")
+    p.add_argument("--no-prefilter", action="store_true")
+    p.add_argument("--embedding-dtype", choices=["float32", "float16"], default="float32")
+    p.add_argument("--no-open", action="store_true", help="Don't open the report in a browser")
+    p.add_argument("--prometheus", action="store_true", help="Also write metrics.prom in Prometheus text format")
+    p.add_argument("--shard", help="Process only shard i/N of the input (0-based), split by domain hash")
+    p.add_argument("-f", "--format", nargs="+", choices=list(WRITERS), default=["json"], help="Output formats for the groups")
+    p.add_argument("--cache-dir", help="Defaults to <output>/cache")
+    p.add_argument("--no-cache", action="store_true")
+    p.add_argument("--cache-ttl", type=float, default=7, help="Days to trust a cached logo URL")
+    p.add_argument("--negative-ttl", type=float, default=1, help="Days to remember a failed lookup")
     args = p.parse_args()
 
-    LogoMatcher(Path(args.output), args.workers, args.threshold).run(Path(args.input))
+    output = Path(args.output)
+    shard = parse_shard(args.shard)
+    default_cache = shards.shard_dir(output, shard) / "cache" if shard else output / "cache"
+    cache_dir = None if args.no_cache else Path(args.cache_dir) if args.cache_dir else default_cache
+
+    LogoMatcher(
+        output,
+        args.workers,
+        args.threshold,
+        engine=args.engine,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        cache_dir=cache_dir,
+        cache_ttl=args.cache_ttl,
+        negative_ttl=args.negative_ttl,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        embedding_dtype=args.embedding_dtype,
+        neighbors=args.neighbors,
+        lsh_bits=args.lsh_bits,
+        lsh_tables=args.lsh_tables,
+        recall_sample=args.recall_sample,
+        hash_radius=None if args.no_prefilter else args.hash_radius,
+        decoders=args.decoders,
+        threads=args.threads,
+        precision=args.precision,
+        drift_sample=args.drift_sample,
+        open_report=not args.no_open,
+        prometheus=args.prometheus,
+        shard=shard,
+        formats=tuple(args.format),
+        budget=args.budget,
+        retry_budget=args.retry_budget,
+        hedge=args.hedge,
+        speculate=args.speculate,
+        sweep=tuple(args.sweep),
+        sweep_color=tuple(args.sweep_color),
+    ).run(Path(args.input))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
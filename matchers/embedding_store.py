@@ -0,0 +1,119 @@
+import os
+import json
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    def __init__(self, directory: Path, dtype: str = "float32"):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.data_path = directory / "embeddings.bin"
+        self.colors_path = directory / "colors.bin"
+        self.index_path = directory / "index.json"
+
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        if self.index_path.exists():
+            meta = json.loads(self.index_path.read_text())
+            self.dtype = np.dtype(meta["dtype"])
+            self.dim = meta["dim"]
+            self.ids = meta["ids"]
+            if meta["dtype"] != np.dtype(dtype).name:
+                logger.warning(f"Embedding store is {meta['dtype']}, ignoring requested {dtype}")
+
+        self._data: Optional[np.memmap] = None
+        self._colors: Optional[np.memmap] = None
+        if self.dim:
+            capacity = self._capacity()
+            if capacity < len(self.ids):
+                logger.warning(f"{self.data_path} is shorter than its index, starting empty")
+                self.ids = []
+            if capacity:
+                self._map(capacity)
+        self.rows: Dict[str, int] = {k: i for i, k in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._data is None:
+            return np.empty((0, self.dim or 0), dtype=self.dtype)
+        return self._data[: len(self.ids)]
+
+    @property
+    def colors(self) -> np.ndarray:
+        if self._colors is None:
+            return np.empty((0, 3), dtype=np.float32)
+        return self._colors[: len(self.ids)]
+
+    def missing(self, keys: Iterable[str]) -> List[str]:
+        return [k for k in keys if k not in self.rows]
+
+    def indices(self, keys: Iterable[str]) -> np.ndarray:
+        return np.array([self.rows[k] for k in keys], dtype=np.int64)
+
+    def vectors(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        m = self.matrix
+        return {k: m[self.rows[k]] for k in keys if k in self.rows}
+
+    def add(self, keys: List[str], vectors: np.ndarray, colors: Optional[np.ndarray] = None):
+        if not keys:
+            return
+        vectors = np.asarray(vectors).reshape(len(keys), -1)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+
+        new = [k for k in dict.fromkeys(keys) if k not in self.rows]
+        needed = len(self.ids) + len(new)
+        if self._data is None or needed > self._data.shape[0]:
+            self._map(max(1024, needed, 2 * len(self.ids)))
+
+        for k in new:
+            self.rows[k] = len(self.ids)
+            self.ids.append(k)
+        self._data[self.indices(keys)] = vectors.astype(self.dtype)
+        if colors is not None:
+            self.set_colors(keys, colors)
+
+    def set_colors(self, keys: List[str], colors: np.ndarray):
+        self._colors[self.indices(keys)] = np.asarray(colors, dtype=np.float32).reshape(len(keys), 3)
+
+    def flush(self):
+        if self._data is not None:
+            self._data.flush()
+            self._colors.flush()
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"dtype": self.dtype.name, "dim": self.dim, "ids": self.ids}))
+        os.replace(tmp, self.index_path)
+
+    def _capacity(self) -> int:
+        row = self.dim * self.dtype.itemsize
+        return self.data_path.stat().st_size // row if self.data_path.exists() else 0
+
+    def _map(self, capacity: int):
+        if self._data is not None:
+            self._data.flush()
+            self._colors.flush()
+        self._data = self._grow(self.data_path, capacity, self.dim, self.dtype)
+        filled = self.colors_path.stat().st_size // 12 if self.colors_path.exists() else 0
+        self._colors = self._grow(self.colors_path, capacity, 3, np.dtype(np.float32))
+        if filled < capacity:
+            self._colors[filled:] = np.nan
+
+    @staticmethod
+    def _grow(path: Path, capacity: int, dim: int, dtype: np.dtype) -> np.memmap:
+        size = capacity * dim * dtype.itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, dim))
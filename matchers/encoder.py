@@ -0,0 +1,135 @@
+import copy
+import time
+import logging
+import numpy as np
+import torch
+from pathlib import Path
+from imagededup.methods import CNN
+from imagededup.utils.image_utils import load_image
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("float32", "float16", "bfloat16", "int8")
+DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16}
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+class Encoder:
+    def __init__(self, cnn: CNN, batch_size: int = 64, threads: Optional[int] = None, precision: str = "float32"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}, expected one of {list(PRECISIONS)}")
+        self.cnn = cnn
+        self.batch_size = batch_size
+        self.precision = precision
+        if threads:
+            torch.set_num_threads(threads)
+
+        self.device = torch.device("cpu") if precision == "int8" else cnn.device
+        self.model = cnn.model.eval()
+        if precision in ("float16", "bfloat16"):
+            self.model = copy.deepcopy(self.model).to(DTYPES[precision])
+        self._calibrated = precision != "int8"
+
+        self.images = 0
+        self.seconds = 0.0
+
+    @property
+    def calibrated(self) -> bool:
+        return self._calibrated
+
+    @property
+    def throughput(self) -> float:
+        return self.images / self.seconds if self.seconds else 0.0
+
+    def encode(self, arrays: List[np.ndarray]) -> np.ndarray:
+        out = []
+        for i in range(0, len(arrays), self.batch_size):
+            start = time.perf_counter()
+            batch = torch.stack([self.cnn.apply_preprocess(a) for a in arrays[i : i + self.batch_size]])
+            out.append(self._forward(batch))
+            self.seconds += time.perf_counter() - start
+            self.images += len(batch)
+        return np.concatenate(out) if out else np.empty((0, 0), dtype=np.float32)
+
+    def _forward(self, batch: torch.Tensor) -> np.ndarray:
+        if not self._calibrated:
+            logger.warning(f"int8 encoder was not calibrated, calibrating on its first batch of {len(batch)} images")
+            self._calibrate([batch])
+        with torch.no_grad():
+            if self.precision in DTYPES:
+                batch = batch.to(DTYPES[self.precision])
+            feats = self.model(batch.to(self.device))
+        return feats.float().cpu().numpy().reshape(len(batch), -1)
+
+    def calibrate(self, arrays: List[np.ndarray]):
+        if self._calibrated or not arrays:
+            return
+        batches = [
+            torch.stack([self.cnn.apply_preprocess(a) for a in arrays[i : i + self.batch_size]])
+            for i in range(0, len(arrays), self.batch_size)
+        ]
+        self._calibrate(batches)
+        logger.info(f"int8 encoder calibrated on {len(arrays)} images")
+
+    def _calibrate(self, batches: List[torch.Tensor]):
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+        prepared = prepare_fx(copy.deepcopy(self.model).cpu(), get_default_qconfig_mapping("x86"), (batches[0][:1],))
+        with torch.no_grad():
+            for batch in batches:
+                prepared(batch)
+        self.model = convert_fx(prepared)
+        self._calibrated = True
+
+    def drift(self, arrays: List[np.ndarray], reference: Optional["Encoder"] = None) -> Dict[str, float]:
+        reference = reference or Encoder(self.cnn, self.batch_size)
+        a = _unit(self.encode(arrays))
+        b = _unit(reference.encode(arrays))
+        diff = np.abs(a @ a.T - b @ b.T)
+        return {
+            "images": len(arrays),
+            "max_abs_similarity_error": float(diff.max()),
+            "mean_abs_similarity_error": float(diff.mean()),
+            "min_self_cosine": float((a * b).sum(axis=1).min()),
+        }
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Measure encode throughput and drift on this machine")
+    p.add_argument("-i", "--images", required=True, help="Directory of images, e.g. output/images")
+    p.add_argument("-n", "--limit", type=int, default=512)
+    p.add_argument("-b", "--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    p.add_argument("-t", "--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    p.add_argument("-p", "--precisions", nargs="+", choices=list(PRECISIONS), default=["float32", "int8"])
+    args = p.parse_args()
+
+    files = sorted(f for f in Path(args.images).iterdir() if f.is_file() and not f.name.startswith("."))
+    arrays = [a for a in (load_image(f) for f in files[: args.limit]) if a is not None]
+    cnn = CNN(verbose=False)
+    reference = Encoder(cnn)
+    for precision in args.precisions:
+        for threads in args.threads:
+            for batch_size in args.batch_sizes:
+                enc = Encoder(cnn, batch_size, threads, precision)
+                enc.calibrate(arrays[:256])
+                enc.encode(arrays[:batch_size])
+                enc.images, enc.seconds = 0, 0.0
+                enc.encode(arrays)
+                line = f"{precision:>8} threads={threads:<3} batch={batch_size:<4} {enc.throughput:8.1f} img/s"
+                if precision != "float32":
+                    drift = enc.drift(arrays[:256], reference)
+                    line += f"  max sim error {drift['max_abs_similarity_error']:.4f}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
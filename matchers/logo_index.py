@@ -0,0 +1,174 @@
+import os
+import json
+import logging
+import numpy as np
+from pathlib import Path
+from threading import Lock
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from matchers.embedding_store import EmbeddingStore
+from matchers.neighbors import ExactSearch
+from matchers.similarity_matcher import SimilarityMatcher
+from matchers.union_find import UnionFind
+from processors.image_processor import IMAGE_EXT
+from utils.writers import read_groups
+
+logger = logging.getLogger(__name__)
+
+STATE = "state.json"
+UNION_FIND = "uf.npy"
+
+
+class LogoIndex:
+    def __init__(self, output: Path, matcher: SimilarityMatcher, store: EmbeddingStore):
+        self.output = output
+        self.matcher = matcher
+        self.store = store
+        self.search = ExactSearch()
+        self.images = output / "images"
+        self.directory = output / "index"
+        self.lock = Lock()
+        self.inserted = 0
+
+        self.keys: List[str] = []
+        self.node: Dict[str, int] = {}
+        self.sites: Dict[str, List[str]] = defaultdict(list)
+        self.labels: Dict[str, str] = {}
+        self.paths: Dict[str, Path] = {}
+        self.uf = UnionFind()
+        self.weight: List[int] = []
+        if self._fresh():
+            self._restore()
+        else:
+            self._build()
+
+        for n, k in enumerate(self.keys):
+            self.weight[self.uf.find(n)] += len(self.sites.get(k, ()))
+        self.row_node = np.empty(0, dtype=np.int64)
+        self._extend_rows()
+        logger.info(f"Index: {len(self.keys)} images, {int((self.row_node >= 0).sum())} searchable embeddings")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _fresh(self) -> bool:
+        state, meta = self.directory / STATE, self.output / "logo_groups.meta.json"
+        return state.exists() and (not meta.exists() or state.stat().st_mtime >= meta.stat().st_mtime)
+
+    def _restore(self):
+        state = json.loads((self.directory / STATE).read_text())
+        self.keys = state["keys"]
+        self.node = {k: n for n, k in enumerate(self.keys)}
+        self.sites.update(state["sites"])
+        self.labels = state["labels"]
+        self.uf = UnionFind.load(self.directory / UNION_FIND)
+        self.paths = {k: self.images / f"{k}{IMAGE_EXT}" for k in self.keys}
+        self.weight = [0] * len(self.keys)
+
+    def _build(self):
+        for group in read_groups(self.output):
+            first = None
+            for site in group["websites"]:
+                digest = site.get("image_hash")
+                if not digest:
+                    continue
+                n = self._add(digest)
+                self.sites[digest].append(site["url"])
+                self.labels.setdefault(digest, group["group_id"])
+                if first is None:
+                    first = n
+                else:
+                    self.uf.union(first, n)
+
+    def _add(self, digest: str) -> int:
+        n = self.node.get(digest)
+        if n is None:
+            n = self.node[digest] = len(self.keys)
+            self.keys.append(digest)
+            self.paths[digest] = self.images / f"{digest}{IMAGE_EXT}"
+            self.uf.grow(n + 1)
+            self.weight.append(0)
+        return n
+
+    def _extend_rows(self):
+        rows = np.array([self.node.get(k, -1) for k in self.store.ids[len(self.row_node) :]], dtype=np.int64)
+        self.row_node = np.concatenate([self.row_node, rows])
+
+    def group(self, digest: str) -> Dict[str, Any]:
+        root = self.uf.find(self.node[digest])
+        return {"group_id": self.labels.get(self.keys[root]), "group_size": self.weight[root]}
+
+    def query(self, vector: np.ndarray, color: np.ndarray) -> List[Dict[str, Any]]:
+        live = np.flatnonzero(self.row_node >= 0)
+        if not len(live):
+            return []
+        edges = list(self.search.nearest(self.store.matrix, vector, self.matcher.threshold, live))
+        if not edges:
+            return []
+
+        sims = np.concatenate([s for _, _, s in edges])
+        keys = [self.store.ids[r] for r in live[np.concatenate([j for _, j, _ in edges])]]
+        colors = self.matcher.dominant_colors(keys, self.paths)
+        colors = np.vstack([np.asarray(color, dtype=np.float32)[None], colors])
+        j = np.arange(1, len(colors))
+        i = np.zeros_like(j)
+        keep = self.matcher.edge_mask(colors, i, j, sims)
+        color_sims = self.matcher.color_similarities(colors, i, j)
+
+        matches = [
+            {"image_hash": keys[n], "score": round(float(sims[n]), 4), "color": round(float(color_sims[n]), 4)}
+            for n in np.flatnonzero(keep)
+        ]
+        return sorted(matches, key=lambda m: m["score"], reverse=True)
+
+    def match(
+        self,
+        digest: str,
+        vector: np.ndarray,
+        color: np.ndarray,
+        insert: bool = False,
+        website: Optional[str] = None,
+        limit: int = 10,
+    ) -> Dict[str, Any]:
+        with self.lock:
+            matches = self.query(vector, color)
+            if insert:
+                self.insert(digest, vector, color, website, matches)
+            if digest in self.node:
+                group = self.group(digest)
+            elif matches:
+                group = self.group(matches[0]["image_hash"])
+            else:
+                group = {"group_id": None, "group_size": 0}
+            for m in matches[:limit]:
+                m.update(self.group(m["image_hash"]), websites=self.sites.get(m["image_hash"], [])[:10])
+            return {"image_hash": digest, **group, "inserted": insert, "matches": matches[:limit]}
+
+    def insert(self, digest: str, vector: np.ndarray, color: np.ndarray, website: Optional[str], matches: List[Dict[str, Any]]):
+        known = digest in self.node
+        n = self._add(digest)
+        if not known:
+            self.labels[digest] = self.group(matches[0]["image_hash"])["group_id"] if matches else f"new_{digest[:12]}"
+        if digest not in self.store:
+            self.store.add([digest], np.asarray(vector)[None], np.asarray(color)[None])
+        if len(self.row_node) < len(self.store):
+            self._extend_rows()
+        row = self.store.rows[digest]
+        self.row_node[row] = n
+
+        if website and website not in self.sites[digest]:
+            self.sites[digest].append(website)
+            self.weight[self.uf.find(n)] += 1
+        self.matcher.extend(self.uf, self.keys, self.store.matrix, self.row_node, self.paths, [row], self.weight)
+        self.inserted += 1
+
+    def save(self):
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.store.flush()
+            self.uf.save(self.directory / UNION_FIND)
+            tmp = self.directory / f"{STATE}.tmp"
+            tmp.write_text(json.dumps({"keys": self.keys, "sites": self.sites, "labels": self.labels}))
+            os.replace(tmp, self.directory / STATE)
+        logger.info(f"Index saved to {self.directory}: {len(self.keys)} images, {self.inserted} inserted")
@@ -0,0 +1,171 @@
+import logging
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _normalized(matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    block = np.asarray(matrix[rows], dtype=np.float32)
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return block / norms
+
+
+def to_duplicates(keys: List[str], edges: Iterator[Edges]) -> Dict[str, List[Tuple[str, float]]]:
+    out: Dict[str, List[Tuple[str, float]]] = {k: [] for k in keys}
+    for i, j, s in edges:
+        for a, b, score in zip(i.tolist(), j.tolist(), s.tolist()):
+            out[keys[a]].append((keys[b], score))
+            out[keys[b]].append((keys[a], score))
+    return out
+
+
+def edge_set(edges: Iterator[Edges]) -> set:
+    pairs = set()
+    for i, j, _ in edges:
+        pairs.update(zip(np.minimum(i, j).tolist(), np.maximum(i, j).tolist()))
+    return pairs
+
+
+class ExactSearch:
+    def __init__(self, tile: int = 2048):
+        self.tile = tile
+
+    def edges(self, matrix: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Iterator[Edges]:
+        rows = np.arange(len(matrix)) if rows is None else rows
+        n = len(rows)
+        for a in range(0, n, self.tile):
+            left = _normalized(matrix, rows[a : a + self.tile])
+            for b in range(a, n, self.tile):
+                right = left if b == a else _normalized(matrix, rows[b : b + self.tile])
+                sims = left @ right.T
+                if b == a:
+                    sims[np.tril_indices_from(sims)] = -2.0
+                i, j = np.nonzero(sims >= threshold)
+                if len(i):
+                    yield i + a, j + b, sims[i, j]
+
+    def query(self, matrix: np.ndarray, queries: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Iterator[Edges]:
+        rows = np.arange(len(matrix)) if rows is None else rows
+        for i, j, s in self.nearest(matrix, matrix[rows[queries]], threshold, rows):
+            keep = queries[i] != j
+            if keep.any():
+                yield queries[i[keep]], j[keep], s[keep]
+
+    def nearest(self, matrix: np.ndarray, vectors: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Iterator[Edges]:
+        rows = np.arange(len(matrix)) if rows is None else rows
+        vectors = np.asarray(vectors).reshape(-1, matrix.shape[1])
+        q = _normalized(vectors, np.arange(len(vectors)))
+        for b in range(0, len(rows), self.tile):
+            sims = q @ _normalized(matrix, rows[b : b + self.tile]).T
+            i, j = np.nonzero(sims >= threshold)
+            if len(i):
+                yield i, j + b, sims[i, j]
+
+    def search(self, keys: List[str], matrix: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Dict[str, List[Tuple[str, float]]]:
+        return to_duplicates(keys, self.edges(matrix, threshold, rows))
+
+
+class LSHSearch:
+    def __init__(
+        self,
+        bits: Optional[int] = None,
+        tables: Optional[int] = None,
+        bucket: int = 256,
+        target: float = 0.9,
+        max_tables: int = 32,
+        tile: int = 2048,
+        seed: int = 0,
+    ):
+        self.bits = bits
+        self.tables = tables
+        self.bucket = bucket
+        self.target = target
+        self.max_tables = max_tables
+        self.tile = tile
+        self.seed = seed
+        self.exact = ExactSearch(tile)
+
+    def center(self, matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        total = np.zeros(matrix.shape[1], dtype=np.float64)
+        for a in range(0, len(rows), self.tile):
+            total += _normalized(matrix, rows[a : a + self.tile]).sum(axis=0)
+        return (total / max(len(rows), 1)).astype(np.float32)
+
+    def cosine(self, matrix: np.ndarray, rows: np.ndarray, threshold: float, mean: np.ndarray, sample: int = 256) -> float:
+        rng = np.random.default_rng(self.seed)
+        queries = np.sort(rng.choice(len(rows), size=min(sample, len(rows)), replace=False))
+        pairs = [(i, j) for i, j, _ in self.exact.query(matrix, queries, threshold, rows)]
+        if not pairs:
+            return threshold
+        i, j = np.concatenate([i for i, _ in pairs]), np.concatenate([j for _, j in pairs])
+        if len(i) > 16 * sample:
+            pick = rng.choice(len(i), size=16 * sample, replace=False)
+            i, j = i[pick], j[pick]
+        x, y = _normalized(matrix, rows[i]) - mean, _normalized(matrix, rows[j]) - mean
+        cos = (x * y).sum(axis=1) / np.maximum(np.linalg.norm(x, axis=1) * np.linalg.norm(y, axis=1), 1e-12)
+        return min(threshold, float(np.quantile(cos, 0.1)))
+
+    def plan(self, n: int, cosine: float) -> Tuple[int, int]:
+        bits = self.bits or max(1, int(np.ceil(np.log2(max(n / self.bucket, 2)))))
+        if self.tables:
+            return bits, self.tables
+        p = 1.0 - np.arccos(np.clip(cosine, -1.0, 1.0)) / np.pi
+        while True:
+            miss = 1.0 - p**bits
+            tables = 1 if miss <= 0 else int(np.ceil(np.log(1.0 - self.target) / np.log(miss)))
+            if tables <= self.max_tables or bits == 1 or self.bits:
+                return bits, max(1, min(tables, self.max_tables))
+            bits -= 1
+
+    def buckets(self, matrix: np.ndarray, rows: np.ndarray, threshold: float) -> Iterator[np.ndarray]:
+        mean = self.center(matrix, rows)
+        cosine = self.cosine(matrix, rows, threshold, mean) if self.tables is None else threshold
+        bits, tables = self.plan(len(rows), cosine)
+        rng = np.random.default_rng(self.seed)
+        planes = rng.standard_normal((matrix.shape[1], bits * tables)).astype(np.float32)
+        weights = 1 << np.arange(bits, dtype=np.int64)
+        codes = np.empty((len(rows), tables), dtype=np.int64)
+        for a in range(0, len(rows), self.tile):
+            signs = (_normalized(matrix, rows[a : a + self.tile]) - mean) @ planes > 0
+            codes[a : a + len(signs)] = signs.reshape(len(signs), tables, bits) @ weights
+
+        largest = 0
+        for t in range(tables):
+            order = np.argsort(codes[:, t], kind="stable")
+            bounds = np.flatnonzero(np.diff(codes[order, t])) + 1
+            for members in np.split(order, bounds):
+                largest = max(largest, len(members))
+                if len(members) > 1:
+                    yield members
+        logger.info(f"LSH: {bits} bits x {tables} tables sized for cosine {cosine:.3f}, largest bucket {largest}")
+
+    def edges(self, matrix: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Iterator[Edges]:
+        rows = np.arange(len(matrix)) if rows is None else rows
+        seen = set()
+        for members in self.buckets(matrix, rows, threshold):
+            for i, j, s in self.exact.edges(matrix, threshold, rows[members]):
+                i, j = members[i], members[j]
+                pairs = list(zip(i.tolist(), j.tolist()))
+                fresh = [n for n, pair in enumerate(pairs) if pair not in seen]
+                seen.update(pairs[n] for n in fresh)
+                if fresh:
+                    yield i[fresh], j[fresh], s[fresh]
+
+    def search(self, keys: List[str], matrix: np.ndarray, threshold: float, rows: Optional[np.ndarray] = None) -> Dict[str, List[Tuple[str, float]]]:
+        return to_duplicates(keys, self.edges(matrix, threshold, rows))
+
+    def sample(self, n: int, size: int) -> np.ndarray:
+        return np.sort(np.random.default_rng(self.seed).choice(n, size=min(size, n), replace=False))
+
+    def recall(self, matrix: np.ndarray, threshold: float, rows: np.ndarray, queries: np.ndarray, found: set) -> float:
+        truth = edge_set(self.exact.query(matrix, queries, threshold, rows))
+        if not truth:
+            return 1.0
+        return len(found & truth) / len(truth)
+
+
+BACKENDS = {"exact": ExactSearch, "approx": LSHSearch}
@@ -1,46 +1,150 @@
-﻿import numpy as np
+﻿import time
+import logging
+import numpy as np
 from pathlib import Path
 from imagededup.methods import CNN
+from imagededup.utils.image_utils import load_image
 from PIL import Image
 from tqdm import tqdm
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from matchers.embedding_store import EmbeddingStore
+from matchers.encoder import Encoder
+from matchers.neighbors import BACKENDS, Edges, ExactSearch, LSHSearch, to_duplicates
+from matchers.union_find import UnionFind
+from processors.image_processor import dominant_color
+from utils.metrics import SIZE_BUCKETS, Metrics
+
+logger = logging.getLogger(__name__)
+
 
 class SimilarityMatcher:
-    def __init__(self, threshold: float = 0.65, color_threshold: float = 0.60):
+    def __init__(
+        self,
+        threshold: float = 0.65,
+        color_threshold: float = 0.60,
+        store: Optional[EmbeddingStore] = None,
+        neighbors: str = "exact",
+        lsh_bits: Optional[int] = None,
+        lsh_tables: Optional[int] = None,
+        recall_sample: int = 0,
+        batch_size: int = 64,
+        threads: Optional[int] = None,
+        precision: str = "float32",
+        metrics: Optional[Metrics] = None,
+    ):
+        self.metrics = metrics
         self.threshold = threshold 
         self.color_threshold = color_threshold 
         self.cnn = CNN()
+        self.encoder = Encoder(self.cnn, batch_size, threads, precision)
+        self.store = store
+        self.search = LSHSearch(lsh_bits, lsh_tables) if neighbors == "approx" else BACKENDS[neighbors]()
+        self.recall_sample = recall_sample
         self.color_cache = {}
 
     def encode(self, image_dir: Path) -> Dict[str, np.ndarray]:
-        return self.cnn.encode_images(image_dir=str(image_dir))
+        paths = sorted(p for p in image_dir.iterdir() if p.is_file() and not p.name.startswith("."))
+        return self.encode_files(paths)
+
+    def encode_files(self, paths: List[Path], arrays: Optional[List[Optional[np.ndarray]]] = None) -> Dict[str, np.ndarray]:
+        arrays = arrays or [None] * len(paths)
+        if self.store is None:
+            encodings: Dict[str, np.ndarray] = {}
+            for i in range(0, len(paths), self.encoder.batch_size):
+                encodings.update(self._encode_batch(paths[i : i + self.encoder.batch_size], arrays[i : i + self.encoder.batch_size]))
+            return encodings
+
+        new = [(p, a) for p, a in zip(paths, arrays) if p.stem not in self.store]
+        for i in range(0, len(new), self.encoder.batch_size):
+            chunk = new[i : i + self.encoder.batch_size]
+            batch = self._encode_batch([p for p, _ in chunk], [a for _, a in chunk])
+            if batch:
+                keys = list(batch)
+                self.store.add(keys, np.stack(list(batch.values())), np.stack([self.color_cache[k] for k in keys]))
+        return self.store.vectors(p.stem for p in paths)
+
+    def calibrate(self, paths: List[Path], arrays: Optional[List[Optional[np.ndarray]]] = None):
+        if self.encoder.calibrated:
+            return
+        arrays = arrays or [None] * len(paths)
+        loaded = [a if a is not None else load_image(p, target_size=None, grayscale=False) for p, a in zip(paths, arrays)]
+        self.encoder.calibrate([a for a in loaded if a is not None])
+
+    def _encode_batch(self, paths: List[Path], arrays: List[Optional[np.ndarray]]) -> Dict[str, np.ndarray]:
+        keys, loaded = [], []
+        for p, arr in zip(paths, arrays):
+            if arr is None:
+                arr = load_image(p, target_size=None, grayscale=False)
+            if arr is not None:
+                keys.append(p.stem)
+                loaded.append(arr)
+                if p.stem not in self.color_cache:
+                    self.color_cache[p.stem] = dominant_color(Image.fromarray(arr))
+        if not loaded:
+            return {}
+
+        return dict(zip(keys, self.encoder.encode(loaded)))
 
     def find_duplicates(self, encodings: Dict[str, np.ndarray]) -> Dict[str, List[Tuple[str, float]]]:
-        return self.cnn.find_duplicates(
-            encoding_map=encodings,
-            min_similarity_threshold=self.threshold,
-            scores=True
-        )
+        keys = list(encodings)
+        matrix, rows = self.embedding_matrix(encodings)
+        return to_duplicates(keys, self.neighbours(matrix, self.threshold, rows))
+
+    def neighbours(self, matrix: np.ndarray, threshold: float, rows: np.ndarray) -> Iterator[Edges]:
+        if not (self.recall_sample and hasattr(self.search, "recall")):
+            yield from self.search.edges(matrix, threshold, rows)
+            return
+        queries = self.search.sample(len(rows), self.recall_sample)
+        found = set()
+        for i, j, scores in self.search.edges(matrix, threshold, rows):
+            hit = np.isin(i, queries) | np.isin(j, queries)
+            found.update(zip(np.minimum(i[hit], j[hit]).tolist(), np.maximum(i[hit], j[hit]).tolist()))
+            yield i, j, scores
+        recall = self.search.recall(matrix, threshold, rows, queries, found)
+        logger.info(f"Approximate neighbour recall at {threshold:g}: {recall:.3f} over {len(queries)} sampled images")
+        if self.metrics:
+            self.metrics.set("neighbor_recall", recall)
+
+    def embedding_matrix(self, encodings: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if self.store is not None and all(k in self.store for k in encodings):
+            return self.store.matrix, self.store.indices(encodings)
+        return np.stack(list(encodings.values())), np.arange(len(encodings))
 
     def get_dominant_color(self, img_path: Path) -> np.ndarray:
-        if img_path in self.color_cache:
-            return self.color_cache[img_path]
+        if img_path.stem in self.color_cache:
+            return self.color_cache[img_path.stem]
         try:
-            img = Image.open(img_path).resize((50, 50)) 
-            pixels = np.array(img.convert("RGB")).reshape(-1, 3)
-            
-            mask = np.any(pixels < 250, axis=1)
-            
-            if mask.sum() > 10: 
-                pixels = pixels[mask]
-                
-            avg_color = pixels.mean(axis=0)
-            self.color_cache[img_path] = avg_color
+            with Image.open(img_path) as img:
+                avg_color = dominant_color(img)
+            self.color_cache[img_path.stem] = avg_color
             return avg_color
         except:
             return np.array([128, 128, 128])
 
+    def dominant_colors(self, keys: List[str], paths: Dict[str, Path]) -> np.ndarray:
+        colors = np.full((len(keys), 3), np.nan, dtype=np.float32)
+        stored = [n for n, k in enumerate(keys) if self.store is not None and k in self.store]
+        if stored:
+            colors[stored] = self.store.colors[self.store.indices(keys[n] for n in stored)]
+
+        missing = np.nonzero(np.isnan(colors).any(axis=1))[0].tolist()
+        for n in missing:
+            colors[n] = self.get_dominant_color(paths[keys[n]])
+        if self.store is not None:
+            known = [n for n in missing if keys[n] in self.store and keys[n] in self.color_cache]
+            if known:
+                self.store.set_colors([keys[n] for n in known], colors[known])
+        return colors
+
+    @staticmethod
+    def color_similarities(colors: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        return 1.0 - np.linalg.norm(colors[i] - colors[j], axis=1) / (np.sqrt(3) * 255)
+
+    def edge_mask(self, colors: np.ndarray, i: np.ndarray, j: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        return (scores >= self.threshold) & (self.color_similarities(colors, i, j) >= self.color_threshold)
+
     def color_similarity(self, img1: Path, img2: Path) -> float:
         c1 = self.get_dominant_color(img1)
         c2 = self.get_dominant_color(img2)
@@ -55,35 +159,172 @@ class SimilarityMatcher:
         return color_sim >= self.color_threshold
 
     def cluster(self, duplicates: Dict[str, List[Tuple[str, float]]], image_map: Dict[str, Path]) -> List[List[str]]:
-        rev_image_map = {v.name: k for k, v in image_map.items()}
-        neighbors = defaultdict(set)
+        sites = self.sites(image_map)
+        keys = list(sites)
+        index = {k: n for n, k in enumerate(keys)}
 
+        i, j, scores = [], [], []
         for img_name, matches in tqdm(duplicates.items(), desc="Matching"):
-            if img_name not in rev_image_map:
+            a = index.get(img_name)
+            if a is None:
                 continue
-            w1 = rev_image_map[img_name]
-            
             for other_img_name, score in matches:
-                if other_img_name in rev_image_map:
-                    w2 = rev_image_map[other_img_name]
-                    if self.should_match(w1, w2, score, image_map):
-                        neighbors[w1].add(w2)
-                        neighbors[w2].add(w1)
+                b = index.get(other_img_name)
+                if b is not None and a < b:
+                    i.append(a)
+                    j.append(b)
+                    scores.append(score)
+        i, j, scores = np.array(i, dtype=np.int64), np.array(j, dtype=np.int64), np.array(scores)
+
+        colors = self.dominant_colors(keys, {k: image_map[sites[k][0]] for k in keys})
+        keep = self.edge_mask(colors, i, j, scores)
+
+        uf = UnionFind(len(keys))
+        uf.union_edges(i[keep], j[keep])
+        return self.expand(uf, keys, sites)
+
+    def group(self, encodings: Dict[str, np.ndarray], image_map: Dict[str, Path]) -> List[List[str]]:
+        sites = self.sites(image_map)
+        encoded = [k for k in encodings if k in sites]
+        keys = encoded + [k for k in sites if k not in encodings]
+        matrix, rows = self.embedding_matrix({k: encodings[k] for k in encoded})
+        colors = self.dominant_colors(encoded, {k: image_map[sites[k][0]] for k in encoded})
+
+        uf = UnionFind(len(keys))
+        searching, candidates, kept = 0.0, 0, 0
+        t = time.perf_counter()
+        for i, j, scores in tqdm(self.neighbours(matrix, self.threshold, rows), desc="Matching"):
+            searching += time.perf_counter() - t
+            keep = self.edge_mask(colors, i, j, scores)
+            uf.union_edges(i[keep], j[keep])
+            candidates += len(i)
+            kept += int(keep.sum())
+            t = time.perf_counter()
+        searching += time.perf_counter() - t
+
+        groups = self.expand(uf, keys, sites)
+        self._report(groups, searching, candidates, kept)
+        return groups
+
+    def _report(self, groups: List[List[str]], searching: float, candidates: int, kept: int):
+        if self.metrics:
+            self.metrics.set("neighbor_search_seconds", round(searching, 3))
+            self.metrics.set("edges", candidates, kind="candidate")
+            self.metrics.set("edges", kept, kind="kept")
+            for g in groups:
+                self.metrics.observe("cluster_size", len(g), SIZE_BUCKETS)
+
+    def sweep(
+        self,
+        encodings: Dict[str, np.ndarray],
+        image_map: Dict[str, Path],
+        thresholds: List[float],
+        color_thresholds: List[float],
+    ) -> Tuple[List[List[str]], List[Dict[str, Any]]]:
+        thresholds = sorted(set(thresholds) | {self.threshold}, reverse=True)
+        color_thresholds = sorted(set(color_thresholds) | {self.color_threshold})
+        sites = self.sites(image_map)
+        encoded = [k for k in encodings if k in sites]
+        keys = encoded + [k for k in sites if k not in encodings]
+        matrix, rows = self.embedding_matrix({k: encodings[k] for k in encoded})
+        colors = self.dominant_colors(encoded, {k: image_map[sites[k][0]] for k in encoded})
+        index = np.int32 if len(keys) < 2**31 else np.int64
+
+        i, j, cnn, color = [], [], [], []
+        searching = 0.0
+        t = time.perf_counter()
+        for a, b, scores in tqdm(self.neighbours(matrix, thresholds[-1], rows), desc="Sweeping"):
+            searching += time.perf_counter() - t
+            sims = self.color_similarities(colors, a, b)
+            keep = sims >= color_thresholds[0]
+            i.append(a[keep].astype(index))
+            j.append(b[keep].astype(index))
+            cnn.append(scores[keep])
+            color.append(sims[keep])
+            t = time.perf_counter()
+        searching += time.perf_counter() - t
+        i, j = np.concatenate(i or [np.empty(0, index)]), np.concatenate(j or [np.empty(0, index)])
+        cnn, color = np.concatenate(cnn or [np.empty(0, np.float32)]), np.concatenate(color or [np.empty(0, np.float32)])
+        order = np.argsort(-cnn, kind="stable")
+        i, j, cnn, color = i[order], j[order], cnn[order], color[order]
+        del order
+        if self.metrics:
+            self.metrics.set("sweep_candidate_edges", len(cnn))
 
-        visited = set()
+        weights = [len(sites[k]) for k in keys]
         groups: List[List[str]] = []
+        kept = 0
+        results = []
+        for c in color_thresholds:
+            keep = color >= c
+            ei, ej, scores = i[keep], j[keep], cnn[keep]
+            uf = UnionFind(len(keys))
+            weight = list(weights)
+            sizes = Counter(weights)
+            done = 0
+            for t in thresholds:
+                end = int(np.count_nonzero(scores >= t))
+                for a, b in zip(ei[done:end].tolist(), ej[done:end].tolist()):
+                    ra, rb = uf.find(a), uf.find(b)
+                    if uf.union(ra, rb):
+                        root = uf.find(ra)
+                        sizes[weight[ra]] -= 1
+                        sizes[weight[rb]] -= 1
+                        weight[root] = weight[ra] + weight[rb]
+                        sizes[weight[root]] += 1
+                done = end
+                if t == self.threshold and c == self.color_threshold:
+                    groups, kept = self.expand(uf, keys, sites), end
+                distribution = {size: n for size, n in sorted(sizes.items()) if n > 0}
+                results.append({
+                    "cnn_threshold": t,
+                    "color_threshold": c,
+                    "edges": end,
+                    "groups": sum(distribution.values()),
+                    "multi_site_groups": sum(n for size, n in distribution.items() if size > 1),
+                    "largest": max(distribution, default=0),
+                    "sizes": distribution,
+                })
+        self._report(groups, searching, len(cnn), kept)
+        return groups, sorted(results, key=lambda r: (r["cnn_threshold"], r["color_threshold"]))
 
-        def dfs(node, group):
-            visited.add(node)
-            group.append(node)
-            for nb in neighbors.get(node, set()):
-                if nb not in visited:
-                    dfs(nb, group)
+    def extend(
+        self,
+        uf: UnionFind,
+        keys: List[str],
+        matrix: np.ndarray,
+        nodes: np.ndarray,
+        paths: Dict[str, Path],
+        new: List[int],
+        weight: Optional[List[int]] = None,
+    ) -> Edges:
+        uf.grow(len(keys))
+        live = np.flatnonzero(nodes >= 0)
+        queries = np.searchsorted(live, np.asarray(new, dtype=np.int64))
+        edges = list(ExactSearch().query(matrix, queries, self.threshold, live))
+        if not edges:
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+        i = nodes[live[np.concatenate([e[0] for e in edges])]]
+        j = nodes[live[np.concatenate([e[1] for e in edges])]]
+        scores = np.concatenate([e[2] for e in edges])
+        ends = np.unique(np.concatenate([i, j]))
+        colors = self.dominant_colors([keys[n] for n in ends], paths)
+        keep = self.edge_mask(colors, np.searchsorted(ends, i), np.searchsorted(ends, j), scores)
+        i, j, scores = i[keep], j[keep], scores[keep]
+        for a, b in zip(i.tolist(), j.tolist()):
+            ra, rb = uf.find(a), uf.find(b)
+            if uf.union(ra, rb) and weight is not None:
+                weight[uf.find(ra)] = weight[ra] + weight[rb]
+        return i, j, scores
 
-        for node in image_map.keys():
-            if node not in visited:
-                group: List[str] = []
-                dfs(node, group)
-                groups.append(group)
+    @staticmethod
+    def sites(image_map: Dict[str, Path]) -> Dict[str, List[str]]:
+        sites = defaultdict(list)
+        for w, p in image_map.items():
+            sites[p.stem].append(w)
+        return sites
 
-        return sorted(groups, key=len, reverse=True)
\ No newline at end of file
+    @staticmethod
+    def expand(uf: UnionFind, keys: List[str], sites: Dict[str, List[str]]) -> List[List[str]]:
+        groups = [[w for n in members for w in sites[keys[n]]] for members in uf.components()]
+        return sorted(groups, key=len, reverse=True)
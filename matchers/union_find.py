@@ -0,0 +1,60 @@
+import numpy as np
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+
+class UnionFind:
+    def __init__(self, n: int = 0):
+        self.parent = array("q", range(n))
+        self.size = array("q", [1]) * n
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def grow(self, n: int):
+        start = len(self.parent)
+        if n > start:
+            self.parent.extend(range(start, n))
+            self.size.extend(array("q", [1]) * (n - start))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> bool:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return True
+
+    def union_edges(self, i: Iterable[int], j: Iterable[int]) -> int:
+        merged = 0
+        for a, b in zip(np.asarray(i).tolist(), np.asarray(j).tolist()):
+            merged += self.union(a, b)
+        return merged
+
+    def components(self) -> List[List[int]]:
+        members: Dict[int, List[int]] = defaultdict(list)
+        for x in range(len(self.parent)):
+            members[self.find(x)].append(x)
+        return list(members.values())
+
+    def save(self, path: Path):
+        np.save(path, np.stack([np.frombuffer(self.parent, dtype=np.int64), np.frombuffer(self.size, dtype=np.int64)]))
+
+    @classmethod
+    def load(cls, path: Path) -> "UnionFind":
+        parent, size = np.load(path)
+        uf = cls()
+        uf.parent = array("q", parent.tobytes())
+        uf.size = array("q", size.tobytes())
+        return uf
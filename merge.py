@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from main import LogoMatcher
+from utils.writers import WRITERS
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Combine the shards in <output>/shards into one logo_groups.json and report")
+    p.add_argument("-o", "--output", default="output")
+    p.add_argument("-t", "--threshold", type=float, default=0.75)
+    p.add_argument("-n", "--neighbors", choices=["exact", "approx"], default="exact")
+    p.add_argument("--lsh-bits", type=int)
+    p.add_argument("--lsh-tables", type=int)
+    p.add_argument("--recall-sample", type=int, default=0)
+    p.add_argument("-f", "--format", nargs="+", choices=list(WRITERS), default=["json"])
+    p.add_argument("--sweep", type=float, nargs="+", default=[], help="Also group at each of these CNN thresholds, from the same search (holds ~40 bytes per candidate edge at the loosest threshold)")
+    p.add_argument("--sweep-color", type=float, nargs="+", default=[])
+    p.add_argument("--wait", type=float, default=0, help="Seconds to wait for unfinished shards")
+    p.add_argument("--no-open", action="store_true")
+    p.add_argument("--prometheus", action="store_true")
+    args = p.parse_args()
+
+    LogoMatcher(
+        Path(args.output),
+        1,
+        args.threshold,
+        neighbors=args.neighbors,
+        lsh_bits=args.lsh_bits,
+        lsh_tables=args.lsh_tables,
+        recall_sample=args.recall_sample,
+        open_report=not args.no_open,
+        prometheus=args.prometheus,
+        formats=tuple(args.format),
+        sweep=tuple(args.sweep),
+        sweep_color=tuple(args.sweep_color),
+    ).merge(args.wait)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
 ﻿import imagehash
 import logging
+import numpy as np
+from typing import Dict, Optional, Sequence
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+HASHES = {
+    'phash': imagehash.phash,
+    'dhash': imagehash.dhash,
+    'ahash': imagehash.average_hash,
+    'whash': imagehash.whash,
+}
+
+
+def pack(h: imagehash.ImageHash) -> int:
+    return int.from_bytes(np.packbits(h.hash.flatten()).tobytes(), "big")
+
+
 class FeatureExtractor:
     def __init__(self, hash_size=16):
         self.hash_size = hash_size
@@ -20,4 +33,11 @@ class FeatureExtractor:
             return features
         except Exception as e:
             logger.error(f"Feature extraction failed: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def extract_packed(self, pil_image, kinds: Sequence[str] = tuple(HASHES)) -> Optional[Dict[str, int]]:
+        try:
+            return {k: pack(HASHES[k](pil_image, hash_size=self.hash_size)) for k in kinds}
+        except Exception as e:
+            logger.error(f"Feature extraction failed: {e}")
+            return None
@@ -0,0 +1,122 @@
+import os
+import json
+import logging
+from PIL import Image
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from processors.feature_extractor import FeatureExtractor
+
+logger = logging.getLogger(__name__)
+
+PREFILTER = "prefilter.json"
+
+
+class BKTree:
+    def __init__(self):
+        self.root: Optional[Tuple[int, Any, Dict[int, tuple]]] = None
+        self.size = 0
+
+    def add(self, key: int, value: Any):
+        self.size += 1
+        if self.root is None:
+            self.root = (key, value, {})
+            return
+        node = self.root
+        while True:
+            d = (key ^ node[0]).bit_count()
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (key, value, {})
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, Any]]:
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            k, value, children = stack.pop()
+            d = (key ^ k).bit_count()
+            if d <= radius:
+                found.append((d, value))
+            for cd, child in children.items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        return sorted(found, key=lambda x: x[0])
+
+
+class HashPrefilter:
+    def __init__(
+        self,
+        radius: int = 4,
+        hash_size: int = 8,
+        same_color: Optional[Callable[[Path, Path], bool]] = None,
+        path: Optional[Path] = None,
+    ):
+        self.radius = radius
+        self.hash_size = hash_size
+        self.features = FeatureExtractor(hash_size=hash_size)
+        self.same_color = same_color
+        self.path = path
+        self.tree = BKTree()
+        self.reps: Dict[str, str] = {}
+        self.hashes: Dict[str, Tuple[int, int]] = {}
+        self.lock = Lock()
+        if path and path.exists():
+            self._load()
+
+    def _load(self):
+        try:
+            state = json.loads(self.path.read_text())
+        except Exception as e:
+            logger.warning(f"Could not read {self.path}: {e}")
+            return
+        if (state.get("radius"), state.get("hash_size")) != (self.radius, self.hash_size):
+            logger.info(f"{self.path} was built with other hash settings, starting fresh")
+            return
+        self.reps = state["reps"]
+        for digest, (phash, dhash) in state["hashes"].items():
+            self.tree.add(phash, (digest, dhash))
+            self.hashes[digest] = (phash, dhash)
+        logger.info(f"Hash prefilter: {len(self.reps)} images, {self.tree.size} representatives from {self.path}")
+
+    def representative(self, path: Path, img: Optional[Image.Image] = None) -> Path:
+        if path.stem in self.reps:
+            return path.with_name(self.reps[path.stem] + path.suffix)
+        try:
+            if img is None:
+                with Image.open(path) as f:
+                    hashes = self.features.extract_packed(f, ("phash", "dhash"))
+            else:
+                hashes = self.features.extract_packed(img, ("phash", "dhash"))
+        except Exception:
+            hashes = None
+        if not hashes:
+            return path
+
+        with self.lock:
+            if path.stem not in self.reps:
+                matches = [
+                    rep
+                    for _, (rep, dhash) in self.tree.search(hashes["phash"], self.radius)
+                    if (dhash ^ hashes["dhash"]).bit_count() <= self.radius
+                    and (not self.same_color or self.same_color(path.with_name(rep + path.suffix), path))
+                ]
+                if not matches:
+                    self.tree.add(hashes["phash"], (path.stem, hashes["dhash"]))
+                    self.hashes[path.stem] = (hashes["phash"], hashes["dhash"])
+                self.reps[path.stem] = min(matches, default=path.stem)
+            return path.with_name(self.reps[path.stem] + path.suffix)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            state = {"radius": self.radius, "hash_size": self.hash_size, "reps": self.reps, "hashes": self.hashes}
+            tmp = self.path.with_name(f"{self.path.name}.tmp")
+            tmp.write_text(json.dumps(state))
+            os.replace(tmp, self.path)
+
+    def stats(self) -> Tuple[int, int]:
+        return len(self.reps), self.tree.size
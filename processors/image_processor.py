@@ -1,40 +1,133 @@
-﻿import requests
+﻿import os
+import hashlib
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 from PIL import Image
 from io import BytesIO
 from pathlib import Path
+from diskcache import Cache
 from fake_useragent import UserAgent
-from typing import Optional
+from typing import Dict, Optional, Tuple
+
+from extractors.logo_extractor import NETWORK_ERRORS, domain_key
+from extractors.scheduler import Deadline, Scheduler
+
+IMAGE_EXT = ".png"
+CANONICAL_SIZE = 256
+
+
+def content_hash(img: Image.Image) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}:{img.size[0]}x{img.size[1]}".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def dominant_color(img: Image.Image) -> np.ndarray:
+    pixels = np.array(img.resize((50, 50)).convert("RGB")).reshape(-1, 3)
+
+    mask = np.any(pixels < 250, axis=1)
+
+    if mask.sum() > 10:
+        pixels = pixels[mask]
+
+    return pixels.mean(axis=0)
+
+
+def normalize(content: bytes, image_dir: Optional[Path]) -> Optional[Tuple[str, np.ndarray]]:
+    try:
+        img = Image.open(BytesIO(content))
+        
+        if min(img.size) < 64:
+            return None
+        
+        if img.mode == "RGBA":
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, mask=img.split()[-1])
+            img = bg
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        digest = content_hash(img)
+        canonical = img.resize((CANONICAL_SIZE, CANONICAL_SIZE), Image.BILINEAR)
+        path = image_dir / f"{digest}{IMAGE_EXT}" if image_dir else None
+        if path and not path.exists():
+            tmp = path.with_name(f".{digest}.{os.getpid()}{IMAGE_EXT}")
+            canonical.save(tmp, "PNG")
+            os.replace(tmp, path)
+        return digest, np.asarray(canonical)
+    except Exception:
+        return None
+
 
 class ImageProcessor:
-    def __init__(self, image_dir: Path):
+    def __init__(
+        self, image_dir: Path, index_dir: Optional[Path] = None, scheduler: Optional[Scheduler] = None, workers: int = 10
+    ):
         self.image_dir = image_dir
+        self.scheduler = scheduler or Scheduler()
         self.image_dir.mkdir(parents=True, exist_ok=True)
+        self.index = Cache(str(index_dir)) if index_dir else None
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.ua = UserAgent()
 
-    def download(self, website: str, url: str) -> Optional[Path]:
+    def path(self, digest: str) -> Path:
+        return self.image_dir / f"{digest}{IMAGE_EXT}"
+
+    def fetch(self, website: str, url: str) -> Optional[Tuple[Optional[str], Optional[bytes], Dict[str, Optional[str]]]]:
         try:
-            r = self.session.get(url, timeout=10, headers={"User-Agent": self.ua.random})
+            key = domain_key(website)
+            entry = self.index.get(key) if self.index is not None and key else None
+            headers = {"User-Agent": self.ua.random}
+            if entry and entry["url"] == url and self.path(entry["hash"]).exists():
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+            else:
+                entry = None
+
+            r = self._get(url, headers)
+            if r.status_code == 304 and entry:
+                return entry["hash"], None, {}
             r.raise_for_status()
-            img = Image.open(BytesIO(r.content))
-            
-            if min(img.size) < 64:
-                return None
-            
-            if img.mode == "RGBA":
-                bg = Image.new("RGB", img.size, (255, 255, 255))
-                bg.paste(img, mask=img.split()[-1])
-                img = bg
-            elif img.mode != "RGB":
-                img = img.convert("RGB")
-
-            safe_website = website.replace("https://", "").replace("http://", "").replace("/", "_").replace(":", "_").replace("?", "_")
-            path = self.image_dir / f"{safe_website}.jpg"
-            
-            img.save(path, "JPEG", quality=95)
-            return path
-        except:
+            return None, r.content, {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+        except Exception:
+            return None
+
+    def _get(self, url: str, headers: Dict[str, str], adaptive: bool = True) -> requests.Response:
+        deadline = Deadline(self.scheduler.ceilings["download"], adaptive)
+        try:
+            with self.scheduler.attempt("download", url, deadline, NETWORK_ERRORS) as timeout:
+                return self.session.get(url, timeout=timeout, headers=headers)
+        except NETWORK_ERRORS:
+            if adaptive and deadline.cut:
+                return self._get(url, headers, adaptive=False)
+            raise
+
+    def remember(self, website: str, url: str, digest: str, validators: Dict[str, Optional[str]]):
+        key = domain_key(website)
+        if self.index is not None and key and validators:
+            self.index.set(key, {"url": url, "hash": digest, **validators})
+
+    def download(self, website: str, url: str) -> Optional[Path]:
+        fetched = self.fetch(website, url)
+        if not fetched:
             return None
+        digest, content, validators = fetched
+        if content is not None:
+            canonical = normalize(content, self.image_dir)
+            if not canonical:
+                return None
+            digest = canonical[0]
+            self.remember(website, url, digest, validators)
+        return self.path(digest)
 
     def close(self):
-        self.session.close()
\ No newline at end of file
+        self.session.close()
+        if self.index is not None:
+            self.index.close()
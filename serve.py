@@ -0,0 +1,219 @@
+import sys
+import json
+import time
+import logging
+import numpy as np
+from pathlib import Path
+from threading import Lock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from PIL import Image
+from typing import Any, Dict, Optional, Tuple
+
+from extractors.logo_extractor import LogoExtractor
+from extractors.scheduler import CircuitOpen
+from processors.image_processor import IMAGE_EXT, ImageProcessor, dominant_color, normalize
+from matchers.similarity_matcher import SimilarityMatcher
+from matchers.embedding_store import EmbeddingStore
+from matchers.logo_index import LogoIndex
+from utils.metrics import Metrics
+
+logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+logger = logging.getLogger("logo-service")
+
+MAX_UPLOAD = 8 * 1024 * 1024
+CALIBRATION = 256
+
+
+class LogoService:
+    def __init__(
+        self,
+        output: Path,
+        threshold: float,
+        cache_dir: Optional[Path] = None,
+        threads: Optional[int] = None,
+        precision: str = "float32",
+        workers: int = 8,
+    ):
+        merged = output / "shards" / "merged"
+        store_dir = merged if merged.exists() else (cache_dir or output / "cache") / "embeddings"
+        self.metrics = Metrics()
+        self.store = EmbeddingStore(store_dir)
+        self.matcher = SimilarityMatcher(threshold=threshold, store=self.store, threads=threads, precision=precision)
+        self.index = LogoIndex(output, self.matcher, self.store)
+        images = output / "images"
+        self.matcher.calibrate(sorted(images.glob(f"*{IMAGE_EXT}"))[:CALIBRATION] if images.exists() else [])
+        self.extractor = LogoExtractor(workers=workers, metrics=self.metrics)
+        self.processor = ImageProcessor(output / "images")
+        self.encoding = Lock()
+
+    def lookup(self, domain: str) -> Optional[Tuple[str, str]]:
+        return self.extractor.extract_with_strategy(domain)
+
+    def download(self, url: str) -> Optional[bytes]:
+        fetched = self.processor.fetch(url, url)
+        return fetched[1] if fetched else None
+
+    def match(self, content: bytes, insert: bool = False, website: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        normalized = normalize(content, self.processor.image_dir if insert else None)
+        if normalized is None:
+            return None
+        digest, arr = normalized
+        with self.encoding, self.metrics.timer("encode_seconds"):
+            vector = self.matcher.encoder.encode([arr])[0]
+        color = dominant_color(Image.fromarray(arr))
+        with self.metrics.timer("search_seconds"):
+            return self.index.match(digest, vector, color, insert=insert, website=website)
+
+    def handle(self, request: Dict[str, Any], content: Optional[bytes] = None) -> Tuple[int, Dict[str, Any]]:
+        start = time.perf_counter()
+        insert = bool(request.get("insert"))
+        website, found = request.get("website") or request.get("domain"), None
+        if content is None and request.get("domain"):
+            try:
+                found = self.lookup(request["domain"])
+            except CircuitOpen as e:
+                return 503, {"error": f"{e} is failing, retry later"}
+            if not found:
+                return 404, {"error": f"No logo found for {request['domain']}"}
+            request["image_url"] = found[0]
+        if content is None and request.get("image_url"):
+            content = self.download(request["image_url"])
+            if content is None:
+                return 502, {"error": f"Could not download {request['image_url']}"}
+        if content is None:
+            return 400, {"error": "Send a domain, an image_url or an image body"}
+
+        result = self.match(content, insert, website)
+        if result is None:
+            return 422, {"error": "Not a usable image (unreadable or under 64px)"}
+        if request.get("image_url"):
+            result["logo_url"] = request["image_url"]
+        if found:
+            result["strategy"] = found[1]
+        seconds = time.perf_counter() - start
+        result["ms"] = round(seconds * 1000, 1)
+        self.metrics.observe("query_seconds", seconds, kind="domain" if found else "image_url" if request.get("image_url") else "upload")
+        self.metrics.inc("queries_total", inserted=str(insert).lower())
+        return 200, result
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "images": len(self.index),
+            "embeddings": len(self.store),
+            "inserted": self.index.inserted,
+            "threshold": self.matcher.threshold,
+            "color_threshold": self.matcher.color_threshold,
+        }
+
+    def close(self):
+        self.index.save()
+        self.extractor.close()
+        self.processor.close()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send(200, self.server.service.health())
+        elif path == "/metrics":
+            self._send(200, self.server.service.metrics.to_prometheus().encode(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        service = self.server.service
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_UPLOAD:
+            self._send(413, {"error": f"Body over {MAX_UPLOAD} bytes"})
+            return
+        body = self.rfile.read(length)
+
+        if url.path == "/save":
+            service.index.save()
+            self._send(200, service.health())
+            return
+        if url.path != "/match":
+            self._send(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        request: Dict[str, Any] = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        request["insert"] = request.get("insert", "").lower() in ("1", "true", "yes")
+        content = None
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                request.update(json.loads(body or b"{}"))
+            except ValueError as e:
+                self._send(400, {"error": f"Invalid JSON: {e}"})
+                return
+        elif body:
+            content = body
+
+        try:
+            self._send(*service.handle(request, content))
+        except Exception as e:
+            logger.error(f"Query failed: {e}")
+            self._send(500, {"error": str(e)})
+
+    def _send(self, status: int, payload: Any, content_type: str = "application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload, default=_plain).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _plain(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+def main():
+    import argparse
+
+    p = argparse.ArgumentParser(description="Answer logo match queries against a finished run")
+    p.add_argument("-o", "--output", default="output", help="Output directory of a run or merge")
+    p.add_argument("-t", "--threshold", type=float, default=0.75)
+    p.add_argument("--cache-dir", help="Defaults to <output>/cache")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("-p", "--port", type=int, default=8000)
+    p.add_argument("--threads", type=int, help="Intra-op threads for CNN inference")
+    p.add_argument("--precision", choices=["float32", "float16", "bfloat16", "int8"], default="float32")
+    args = p.parse_args()
+
+    service = LogoService(
+        Path(args.output),
+        args.threshold,
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        threads=args.threads,
+        precision=args.precision,
+    )
+    server = _Server((args.host, args.port), _Handler)
+    server.service = service
+    logger.info(f"Serving {len(service.index)} logos on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
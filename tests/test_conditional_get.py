@@ -0,0 +1,80 @@
+import io
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from PIL import Image
+
+from processors.image_processor import ImageProcessor
+
+
+def png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (96, 96), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class Origin(ThreadingHTTPServer):
+    daemon_threads = True
+    etag, body = '"v1"', png((200, 20, 20))
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.seen = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+
+@pytest.fixture
+def origin():
+    server = Origin()
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def processor(tmp_path):
+    p = ImageProcessor(tmp_path / "images", tmp_path / "index")
+    yield p
+    p.close()
+
+
+def test_unchanged_logo_is_revalidated_not_downloaded(origin, processor):
+    url = f"http://127.0.0.1:{origin.server_port}/logo.png"
+    first = processor.download("example.com", url)
+    assert first.exists()
+    assert processor.fetch("www.example.com", url) == (first.stem, None, {})
+    assert processor.download("example.com", url) == first
+    assert origin.seen == [None, '"v1"', '"v1"']
+
+
+def test_changed_logo_is_downloaded_again(origin, processor):
+    url = f"http://127.0.0.1:{origin.server_port}/logo.png"
+    first = processor.download("example.com", url)
+    origin.etag, origin.body = '"v2"', png((20, 20, 200))
+    second = processor.download("example.com", url)
+    assert second != first and second.exists()
+
+
+def test_no_validators_without_the_stored_image(origin, processor):
+    url = f"http://127.0.0.1:{origin.server_port}/logo.png"
+    processor.download("example.com", url).unlink()
+    assert processor.download("example.com", url).exists()
+    assert processor.download("example.com", f"{url}?other") is not None
+    assert origin.seen == [None, None, None]
@@ -0,0 +1,47 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils.data_reader import DataReader, DigestSet, parse_shard
+
+
+def test_digest_set_matches_a_python_set():
+    rng = np.random.default_rng(0)
+    seen, reference = DigestSet(), set()
+    for _ in range(50):
+        batch = rng.integers(0, 5000, rng.integers(0, 300)).astype(np.uint64)
+        fresh = seen.add(batch)
+        expected = []
+        for d in batch.tolist():
+            expected.append(d not in reference)
+            reference.add(d)
+        assert fresh.tolist() == expected
+    assert len(seen) == len(reference)
+    assert len(seen.runs) <= 2 * np.log2(len(reference))
+
+
+def test_domains_dedupe_across_spellings(tmp_path):
+    path = tmp_path / "sites.csv"
+    path.write_text("id,domain\n1,example.com\n2,https://www.example.com\n3,other.org\n4,\n5, example.com/about\n6,other.org\n")
+    assert list(DataReader.stream(path)) == ["example.com", "other.org"]
+
+    text = tmp_path / "sites.txt"
+    text.write_text("a.com\nb.com\nwww.a.com\n")
+    assert DataReader.read_text_file(str(text)) == ["a.com", "b.com"]
+
+
+def test_shards_partition_the_input(tmp_path):
+    path = tmp_path / "sites.parquet"
+    sites = [f"site{n}.com" for n in range(3000)]
+    pq.write_table(pa.table({"id": list(range(3000)), "website": sites}), path, row_group_size=700)
+    slices = [list(DataReader.stream(path, shard=(i, 4))) for i in range(4)]
+    assert sorted(sum(slices, [])) == sorted(sites)
+    assert all(500 < len(s) < 1000 for s in slices)
+    assert slices[1] == list(DataReader.stream(path, shard=parse_shard("1/4")))
+
+
+@pytest.mark.parametrize("spec", ["4/4", "-1/2", "1"])
+def test_bad_shard_specs(spec):
+    with pytest.raises(ValueError):
+        parse_shard(spec)
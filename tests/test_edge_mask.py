@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from pathlib import Path
+
+import matchers.similarity_matcher as similarity_matcher
+from matchers.similarity_matcher import SimilarityMatcher
+
+
+@pytest.fixture(autouse=True)
+def no_cnn(monkeypatch):
+    monkeypatch.setattr(similarity_matcher, "CNN", lambda *a, **k: None)
+    monkeypatch.setattr(similarity_matcher, "Encoder", lambda *a, **k: None)
+
+
+@pytest.mark.parametrize("threshold,color_threshold", [(0.65, 0.6), (0.8, 0.9), (0.5, 0.0)])
+def test_edge_mask_agrees_with_should_match(threshold, color_threshold):
+    rng = np.random.default_rng(0)
+    keys = [f"h{n}" for n in range(200)]
+    colors = rng.uniform(0, 255, (200, 3))
+    colors[100:] = colors[:100] + rng.normal(scale=20, size=(100, 3))
+    m = SimilarityMatcher(threshold=threshold, color_threshold=color_threshold)
+    m.color_cache.update(zip(keys, colors))
+    image_map = {f"{k}.com": Path(f"/x/{k}.png") for k in keys}
+
+    i, j = rng.integers(0, 200, 5000), rng.integers(0, 200, 5000)
+    scores = rng.uniform(0.4, 1.0, 5000).astype(np.float32)
+    mask = m.edge_mask(m.dominant_colors(keys, {k: Path(f"/x/{k}.png") for k in keys}), i, j, scores)
+    expected = [m.should_match(f"{keys[a]}.com", f"{keys[b]}.com", s, image_map) for a, b, s in zip(i, j, scores)]
+    assert mask.tolist() == expected
+    assert mask.any() and not mask.all()
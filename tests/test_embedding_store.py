@@ -0,0 +1,42 @@
+import numpy as np
+
+from matchers.embedding_store import EmbeddingStore
+
+
+def vectors(n, start=0):
+    return np.arange(start * 4, (start + n) * 4, dtype=np.float32).reshape(n, 4)
+
+
+def test_reopen_and_append(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.add(["a", "b"], vectors(2), np.array([[1, 2, 3], [4, 5, 6]]))
+    store.add(["b"], vectors(1, 9))
+    store.flush()
+
+    store = EmbeddingStore(tmp_path, "float16")
+    assert store.dtype == np.float32 and store.ids == ["a", "b"]
+    np.testing.assert_array_equal(store.matrix, np.vstack([vectors(1), vectors(1, 9)]))
+    np.testing.assert_array_equal(store.colors[0], [1, 2, 3])
+
+    keys = [f"k{n}" for n in range(2000)]
+    store.add(keys, vectors(2000, 2))
+    store.flush()
+    store = EmbeddingStore(tmp_path)
+    assert len(store) == 2002 and store.missing(["a", "k1999", "z"]) == ["z"]
+    np.testing.assert_array_equal(store.vectors(["k1999"])["k1999"], vectors(1, 2001)[0])
+    assert np.isnan(store.colors[store.indices(["k0"])]).all()
+
+
+def test_float16_store(tmp_path):
+    store = EmbeddingStore(tmp_path, "float16")
+    store.add(["a"], vectors(1))
+    store.flush()
+    assert EmbeddingStore(tmp_path).matrix.dtype == np.float16
+
+
+def test_truncated_data_starts_empty(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.add(["a", "b"], vectors(2))
+    store.flush()
+    (tmp_path / "embeddings.bin").write_bytes(b"")
+    assert len(EmbeddingStore(tmp_path)) == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from pathlib import Path
+
+import matchers.similarity_matcher as similarity_matcher
+from matchers.similarity_matcher import SimilarityMatcher
+from matchers.union_find import UnionFind
+
+
+@pytest.fixture(autouse=True)
+def no_cnn(monkeypatch):
+    monkeypatch.setattr(similarity_matcher, "CNN", lambda *a, **k: None)
+    monkeypatch.setattr(similarity_matcher, "Encoder", lambda *a, **k: None)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(1)
+    brands = rng.normal(size=(30, 64))
+    keys = [f"h{n}" for n in range(300)]
+    matrix = np.stack([brands[n % 30] + rng.normal(scale=0.8, size=64) for n in range(300)]).astype(np.float32)
+    colors = {k: rng.uniform(0, 255, 3) for k in keys}
+    return keys, matrix, colors
+
+
+def components(uf, keys):
+    return sorted(sorted(keys[n] for n in members) for members in uf.components())
+
+
+def test_extend_matches_batch_grouping(corpus):
+    keys, matrix, colors = corpus
+    m = SimilarityMatcher(threshold=0.6, color_threshold=0.5)
+    m.color_cache.update(colors)
+    paths = {k: Path(f"/x/{k}.png") for k in keys}
+
+    uf, weight = UnionFind(), []
+    for end in (100, 250, 300):
+        start = len(weight)
+        weight.extend([2] * (end - start))
+        nodes = np.full(len(matrix), -1, dtype=np.int64)
+        nodes[:end] = np.arange(end)
+        m.extend(uf, keys[:end], matrix, nodes, paths, list(range(start, end)), weight)
+
+    expected = m.group(dict(zip(keys, matrix)), {f"{k}.com": paths[k] for k in keys})
+    assert components(uf, keys) == sorted(sorted(w[:-4] for w in g) for g in expected)
+    for members in uf.components():
+        assert weight[uf.find(members[0])] == 2 * len(members)
+
+
+def test_extend_skips_rows_without_a_node(corpus):
+    keys, matrix, colors = corpus
+    m = SimilarityMatcher(threshold=0.6, color_threshold=0.0)
+    m.color_cache.update(colors)
+    twin = np.vstack([matrix[:1], matrix[:1]])
+    uf = UnionFind()
+    i, j, _ = m.extend(uf, ["h0"], twin, np.array([0, -1]), {}, [0])
+    assert len(i) == 0 and len(uf) == 1
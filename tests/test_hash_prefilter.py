@@ -0,0 +1,61 @@
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+from processors.hash_index import HashPrefilter
+
+
+class Hashes:
+    def extract_packed(self, img, kinds):
+        return {"phash": img[0], "dhash": img[1]}
+
+
+def prefilter(path=None, radius=4):
+    p = HashPrefilter(radius=radius, path=path)
+    p.features = Hashes()
+    return p
+
+
+def pattern(seed):
+    return Image.fromarray(np.random.default_rng(seed).integers(0, 255, (16, 16, 3), dtype=np.uint8).repeat(8, 0).repeat(8, 1))
+
+
+def test_near_duplicates_collapse_onto_one_representative(tmp_path):
+    p = HashPrefilter(radius=4)
+    base = pattern(0)
+    tweaked = base.copy()
+    tweaked.putpixel((0, 0), (0, 0, 0))
+    reps = [p.representative(tmp_path / f"{name}.png", img) for name, img in [("b", base), ("a", tweaked), ("c", pattern(1))]]
+    assert [r.stem for r in reps] == ["b", "b", "c"]
+    assert p.stats() == (3, 2)
+
+
+def test_the_smallest_matching_digest_is_the_representative(tmp_path):
+    p = prefilter()
+    assert p.representative(tmp_path / "f.png", (0b0000, 0)).stem == "f"
+    assert p.representative(tmp_path / "d.png", (0b11111111, 0)).stem == "d"
+    assert p.representative(tmp_path / "x.png", (0b1111, 0)).stem == "d"
+    assert p.representative(tmp_path / "y.png", (0b111110000000, 0)).stem == "y"
+
+
+def test_color_check_rejects_a_hash_match(tmp_path):
+    p = prefilter()
+    p.same_color = lambda rep, path: rep.stem != "a"
+    p.representative(tmp_path / "a.png", (0, 0))
+    p.representative(tmp_path / "b.png", (1, 0))
+    assert p.representative(tmp_path / "c.png", (1, 1)).stem == "b"
+
+
+def test_reps_survive_a_rerun_without_rehashing(tmp_path):
+    state = tmp_path / "prefilter.json"
+    p = prefilter(state)
+    p.representative(tmp_path / "b.png", (0, 0))
+    p.representative(tmp_path / "c.png", (1, 0))
+    p.save()
+
+    again = prefilter(state)
+    again.features = None
+    assert again.representative(Path(tmp_path / "c.png")).stem == "b"
+    again.features = Hashes()
+    assert again.representative(tmp_path / "e.png", (2, 0)).stem == "b"
+    assert prefilter(state, radius=2).stats() == (0, 0)
@@ -0,0 +1,102 @@
+import time
+import pytest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import extractors.logo_extractor as logo_extractor
+from extractors.logo_extractor import LogoExtractor, parse, ranked_candidates
+
+PAGE = b"""<html><head>
+<meta property="og:image" content="/og.png">
+<link rel="apple-touch-icon" href="/touch.png">
+</head><body>
+<header><img src="/a.png" alt="banner"><img src="/brand.png" class="brand"><img src="/logo.png" width="200"></header>
+<main><img src="/main-logo.png" alt="logo"></main>
+</body></html>"""
+
+
+class Site(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, routes):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.routes = routes
+        self.hits = Counter()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def _respond(self, body):
+        self.server.hits[self.path] += 1
+        status, content_type, content, delay = self.server.routes.get(self.path, (404, "text/plain", b"", 0))
+        time.sleep(delay)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+
+def image(delay=0.0):
+    return 200, "image/png", b"x" * 4096, delay
+
+
+@pytest.fixture
+def site(monkeypatch):
+    server = Site({"/": (200, "text/html", PAGE, 0)})
+    Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(logo_extractor, "CLEARBIT_URL", f"http://127.0.0.1:{server.server_port}/clearbit/{{domain}}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def extract(site, **kwargs):
+    extractor = LogoExtractor(workers=2, **kwargs)
+    try:
+        return extractor.extract_with_strategy(f"http://127.0.0.1:{site.server_port}")
+    finally:
+        extractor.close()
+
+
+def test_candidates_keep_priority_order():
+    metas, headers = parse(PAGE, "https://example.com")
+    ranked = ranked_candidates(metas, headers, "https://example.com")
+    assert [(s, u.replace("https://example.com", ""), m) for s, u, m in ranked] == [
+        ("og:image", "/og.png", 2000),
+        ("apple-touch-icon", "/touch.png", 2000),
+        ("header", "/logo.png", 2000),
+        ("header", "/brand.png", 2000),
+        ("fallback", "/logo.png", 500),
+        ("fallback", "/logo.svg", 500),
+        ("fallback", "/images/logo.png", 500),
+        ("fallback", "/favicon.ico", 500),
+    ]
+
+
+def test_clearbit_hit_skips_the_homepage(site):
+    site.routes[f"/clearbit/127.0.0.1:{site.server_port}"] = image()
+    url, strategy = extract(site)
+    assert strategy == "clearbit" and site.hits["/"] == 0
+
+
+def test_slow_higher_priority_candidate_still_wins(site):
+    site.routes.update({"/og.png": image(0.3), "/touch.png": image(), "/logo.png": image()})
+    url, strategy = extract(site)
+    assert (strategy, url.rsplit("/", 1)[1]) == ("og:image", "og.png")
+    assert site.hits["/touch.png"] == 1 and site.hits["/"] == 1
+
+
+def test_falls_back_to_well_known_paths(site):
+    site.routes["/favicon.ico"] = (200, "image/x-icon", b"x" * 1024, 0)
+    assert extract(site)[1] == "fallback"
@@ -0,0 +1,104 @@
+import io
+import json
+import numpy as np
+import pytest
+from threading import Lock
+from PIL import Image
+
+import matchers.similarity_matcher as similarity_matcher
+from matchers.embedding_store import EmbeddingStore
+from matchers.logo_index import LogoIndex
+from matchers.similarity_matcher import SimilarityMatcher
+from processors.image_processor import ImageProcessor
+from utils.metrics import Metrics
+from utils.writers import NdjsonWriter
+
+RED, BLUE = np.array([200.0, 20.0, 20.0]), np.array([20.0, 20.0, 200.0])
+
+
+@pytest.fixture(autouse=True)
+def no_cnn(monkeypatch):
+    monkeypatch.setattr(similarity_matcher, "CNN", lambda *a, **k: None)
+    monkeypatch.setattr(similarity_matcher, "Encoder", lambda *a, **k: None)
+
+
+def unit(*values):
+    v = np.zeros(8, dtype=np.float32)
+    v[: len(values)] = values
+    return v / np.linalg.norm(v)
+
+
+def run(output, groups, vectors, colors):
+    output.mkdir(exist_ok=True)
+    (output / NdjsonWriter.name).write_text("".join(json.dumps(g) + "\n" for g in groups))
+    store = EmbeddingStore(output / "cache" / "embeddings")
+    store.add(list(vectors), np.stack(list(vectors.values())), np.stack([colors[k] for k in vectors]))
+    return store
+
+
+def group(group_id, *sites):
+    return {"group_id": group_id, "websites": [{"url": u, "image_hash": h} for u, h in sites]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = run(
+        tmp_path,
+        [group("g_a", ("a1.com", "a"), ("a2.com", "a")), group("g_b", ("b.com", "b"))],
+        {"a": unit(1), "b": unit(0, 1)},
+        {"a": RED, "b": RED},
+    )
+    return LogoIndex(tmp_path, SimilarityMatcher(threshold=0.7, color_threshold=0.8, store=store), store)
+
+
+def test_empty_index_returns_no_matches(tmp_path):
+    store = EmbeddingStore(tmp_path / "cache" / "embeddings")
+    index = LogoIndex(tmp_path, SimilarityMatcher(store=store), store)
+    assert index.query(unit(1), RED) == []
+    assert index.match("x", unit(1), RED) == {
+        "image_hash": "x", "group_id": None, "group_size": 0, "inserted": False, "matches": []
+    }
+
+
+def test_query_applies_both_thresholds(index):
+    assert [m["image_hash"] for m in index.query(unit(1, 0.1), RED)] == ["a"]
+    assert index.query(unit(1, 0.1), BLUE) == []
+    assert index.query(unit(1, 1, 1), RED) == []
+
+
+def test_match_reports_the_matched_group(index):
+    result = index.match("new", unit(1, 0.1), RED, website="new.com")
+    assert (result["group_id"], result["group_size"], result["inserted"]) == ("g_a", 2, False)
+    assert result["matches"][0]["websites"] == ["a1.com", "a2.com"]
+    assert "new" not in index.node and "new" not in index.store
+
+
+def test_insert_joins_and_bridges_groups(index, tmp_path):
+    index.match("new", unit(1, 0.1), RED, insert=True, website="new.com")
+    assert index.group("new") == {"group_id": "g_a", "group_size": 3}
+    assert "new" in index.store
+
+    bridge = index.match("bridge", unit(1, 1), RED, insert=True, website="bridge.com")
+    assert bridge["group_size"] == 5
+    assert index.group("b") == index.group("a") == index.group("new")
+
+    index.save()
+    reopened = LogoIndex(tmp_path, index.matcher, EmbeddingStore(tmp_path / "cache" / "embeddings"))
+    assert reopened.group("b") == index.group("b")
+    assert sorted(reopened.sites["bridge"]) == ["bridge.com"]
+
+
+def test_service_writes_images_only_on_insert(index, tmp_path):
+    import serve
+
+    service = serve.LogoService.__new__(serve.LogoService)
+    service.metrics, service.encoding, service.index, service.matcher = Metrics(), Lock(), index, index.matcher
+    service.processor = ImageProcessor(tmp_path / "images")
+    service.matcher.encoder = type("Encoder", (), {"encode": lambda self, arrays: [unit(1, 0.1)]})()
+    buf = io.BytesIO()
+    Image.new("RGB", (96, 96), tuple(int(c) for c in RED)).save(buf, "PNG")
+
+    assert service.match(buf.getvalue())["group_id"] == "g_a"
+    assert not list((tmp_path / "images").iterdir())
+    result = service.match(buf.getvalue(), insert=True, website="up.com")
+    assert [p.stem for p in (tmp_path / "images").iterdir()] == [result["image_hash"]]
@@ -0,0 +1,45 @@
+import io
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from PIL import Image
+
+from processors.image_processor import CANONICAL_SIZE, IMAGE_EXT, normalize
+
+
+def encode(img, fmt="PNG"):
+    buf = io.BytesIO()
+    img.save(buf, fmt)
+    return buf.getvalue()
+
+
+def test_transparency_is_flattened_onto_white(tmp_path):
+    img = Image.new("RGBA", (100, 80), (255, 0, 0, 0))
+    img.paste((0, 0, 255, 255), (0, 0, 50, 80))
+    digest, arr = normalize(encode(img), tmp_path)
+    assert arr.shape == (CANONICAL_SIZE, CANONICAL_SIZE, 3) and arr.dtype == np.uint8
+    assert tuple(arr[0, 0]) == (0, 0, 255) and tuple(arr[0, -1]) == (255, 255, 255)
+    with Image.open(tmp_path / f"{digest}{IMAGE_EXT}") as saved:
+        np.testing.assert_array_equal(np.asarray(saved), arr)
+
+
+def test_same_pixels_share_a_digest_across_formats(tmp_path):
+    img = Image.new("P", (64, 64), 3)
+    png = normalize(encode(img), tmp_path)
+    bmp = normalize(encode(img.convert("RGB"), "BMP"), tmp_path)
+    assert png[0] == bmp[0]
+    assert [p.stem for p in tmp_path.iterdir()] == [png[0]]
+
+
+def test_unusable_images_are_rejected(tmp_path):
+    assert normalize(encode(Image.new("RGB", (63, 200))), tmp_path) is None
+    assert normalize(b"<html>not an image</html>", tmp_path) is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_runs_in_a_spawned_decoder():
+    content = encode(Image.new("RGB", (128, 128), (10, 200, 30)))
+    with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+        digest, arr = pool.submit(normalize, content, None).result()
+    assert digest == normalize(content, None)[0]
+    assert tuple(arr[5, 5]) == (10, 200, 30)
@@ -0,0 +1,47 @@
+from threading import Lock
+
+from utils.pipeline import Stage, batched
+
+
+def test_batched_keeps_the_short_tail():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+
+def test_stages_drain_in_order_of_closing():
+    out, lock = [], Lock()
+
+    def square(n):
+        if n == 3:
+            raise ValueError("bad item")
+        sink.put(n * n)
+
+    def collect(items):
+        for batch in batched(items, 4):
+            with lock:
+                out.extend(batch)
+
+    sink = Stage(collect, stream=True).start()
+    workers = Stage(square, workers=4, size=2, outbox=sink).start()
+    for n in range(50):
+        workers.put(n)
+    workers.close()
+    workers.join()
+    sink.join()
+
+    assert sorted(out) == [n * n for n in range(50) if n != 3]
+    assert workers.stats()["items"] == 50
+    assert sink.stats()["items"] == 49
+
+
+def test_a_failing_stream_still_drains_its_inbox():
+    def broken(items):
+        next(iter(items))
+        raise RuntimeError("stop")
+
+    stage = Stage(broken, size=2, stream=True).start()
+    for n in range(10):
+        stage.put(n)
+    stage.close()
+    stage.join()
+    assert stage.stats()["items"] == 10
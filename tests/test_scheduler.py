@@ -0,0 +1,89 @@
+import time
+import pytest
+
+from extractors.scheduler import BudgetExhausted, CircuitOpen, Deadline, Scheduler
+from utils.metrics import Metrics
+
+
+def fail(scheduler, url, deadline=None, seconds=0.0):
+    with pytest.raises(ConnectionError):
+        with scheduler.attempt("page", url, deadline, (ConnectionError,)):
+            time.sleep(seconds)
+            raise ConnectionError(url)
+
+
+def succeed(scheduler, url, deadline=None):
+    with scheduler.attempt("page", url, deadline) as timeout:
+        return timeout
+
+
+def test_breaker_opens_after_consecutive_failures_and_half_opens():
+    metrics = Metrics()
+    scheduler = Scheduler(cooldown=0.1, metrics=metrics)
+    for _ in range(2):
+        fail(scheduler, "http://flaky.test/")
+    succeed(scheduler, "http://flaky.test/")
+    for _ in range(3):
+        fail(scheduler, "http://flaky.test/a")
+
+    deadline = scheduler.deadline()
+    with pytest.raises(CircuitOpen):
+        succeed(scheduler, "http://flaky.test/b", deadline)
+    assert deadline.blocked and not deadline.cut
+    succeed(scheduler, "http://other.test/")
+
+    time.sleep(0.12)
+    fail(scheduler, "http://flaky.test/probe")
+    with pytest.raises(CircuitOpen):
+        succeed(scheduler, "http://flaky.test/")
+    time.sleep(0.12)
+    succeed(scheduler, "http://flaky.test/")
+    succeed(scheduler, "http://flaky.test/")
+    assert metrics.to_prometheus().count("circuit_opened_total") >= 1
+
+
+def test_shared_hosts_never_open():
+    scheduler = Scheduler()
+    scheduler.exempt("logo.clearbit.com")
+    for _ in range(10):
+        fail(scheduler, "https://logo.clearbit.com/x.com")
+    succeed(scheduler, "https://logo.clearbit.com/y.com")
+
+
+def test_timeouts_adapt_to_latency_within_the_ceiling():
+    scheduler = Scheduler(timeouts={"page": 4.0}, min_samples=20, floor=0.5)
+    assert scheduler.adaptive("page") == 4.0
+    for _ in range(20):
+        scheduler.latency["page"].observe(0.1)
+    assert scheduler.adaptive("page") == 0.5
+    for _ in range(20):
+        scheduler.latency["page"].observe(3.0)
+    assert scheduler.adaptive("page") == 4.0
+    assert scheduler.timeout("page", Deadline(1.0)) <= 1.0
+    assert scheduler.timeout("page", Deadline(10.0, adaptive=False)) == 4.0
+
+
+def test_expired_budget_stops_new_attempts():
+    scheduler = Scheduler()
+    with pytest.raises(BudgetExhausted):
+        succeed(scheduler, "http://slow.test/", Deadline(0.01))
+
+
+def test_cut_timeouts_do_not_count_against_the_host():
+    scheduler = Scheduler(min_samples=1, floor=0.05, factor=1.0)
+    scheduler.latency["page"].observe(0.05)
+    for _ in range(5):
+        deadline = scheduler.deadline()
+        fail(scheduler, "http://slow.test/", deadline, seconds=0.06)
+        assert deadline.cut
+    succeed(scheduler, "http://slow.test/")
+    assert "slow.test" not in scheduler.hosts
+
+
+def test_hedging_waits_for_enough_clearbit_samples():
+    assert Scheduler().hedge_delay() is None
+    scheduler = Scheduler(hedge=True, min_samples=10)
+    assert scheduler.hedge_delay() is None
+    for n in range(10):
+        scheduler.latency["clearbit"].observe(0.1 * (n + 1))
+    assert 0.8 < scheduler.hedge_delay() < 1.0
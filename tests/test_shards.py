@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+import matchers.similarity_matcher as similarity_matcher
+from main import LogoMatcher
+from matchers.embedding_store import EmbeddingStore
+from utils import shards
+from utils.writers import read_groups
+
+RED = [200.0, 20.0, 20.0]
+
+
+@pytest.fixture(autouse=True)
+def no_cnn(monkeypatch):
+    encoder = SimpleNamespace(images=0, throughput=0.0, calibrated=True, precision="float32")
+    monkeypatch.setattr(similarity_matcher, "CNN", lambda *a, **k: None)
+    monkeypatch.setattr(similarity_matcher, "Encoder", lambda *a, **k: encoder)
+
+
+def unit(*values):
+    v = np.zeros(8, dtype=np.float32)
+    v[: len(values)] = values
+    return v / np.linalg.norm(v)
+
+
+def shard(output, i, n, websites, vectors, done=True):
+    directory = shards.shard_dir(output, (i, n))
+    shards.start(directory)
+    store = EmbeddingStore(directory / "embeddings")
+    store.add(list(vectors), np.stack(list(vectors.values())), np.array([RED] * len(vectors)))
+    store.flush()
+    if done:
+        shards.finish(directory, {"shard": [i, n], "total": len(websites), "websites": websites})
+    return directory
+
+
+def test_collect_waits_for_every_shard(tmp_path):
+    shard(tmp_path, 0, 2, {}, {"a": unit(1)})
+    assert shards.collect(tmp_path) is None
+    late = shard(tmp_path, 1, 2, {}, {"b": unit(1)}, done=False)
+    assert shards.collect(tmp_path) is None
+    shards.finish(late, {"shard": [1, 2], "total": 0, "websites": {}})
+    assert [d.name for d in shards.collect(tmp_path)] == ["0-of-2", "1-of-2"]
+    shard(tmp_path, 0, 3, {}, {"a": unit(1)})
+    assert shards.collect(tmp_path) is None
+
+
+def test_merge_groups_across_shards(tmp_path):
+    shard(tmp_path, 0, 2, {
+        "a.com": ["http://a.com/l.png", "h1", "h1"],
+        "b.com": ["http://b.com/l.png", "h2", "h1"],
+        "f.com": ["http://f.com/l.png", None, None],
+    }, {"h1": unit(1)})
+    shard(tmp_path, 1, 2, {
+        "c.com": ["http://c.com/l.png", "h1", "h1"],
+        "d.com": ["http://d.com/l.png", "h3", "h3"],
+        "e.com": ["http://e.com/l.png", "h4", "h4"],
+    }, {"h1": unit(1), "h3": unit(1, 0.1), "h4": unit(0, 1)})
+
+    LogoMatcher(tmp_path, 1, 0.75, open_report=False, formats=("ndjson",)).merge()
+    assert EmbeddingStore(tmp_path / "shards" / "merged").ids == ["h1", "h3", "h4"]
+    groups = sorted(sorted(site["url"] for site in g["websites"]) for g in read_groups(tmp_path))
+    assert groups == [["a.com", "b.com", "c.com", "d.com"], ["e.com"]]
+    image_hashes = {site["url"]: site["image_hash"] for g in read_groups(tmp_path) for site in g["websites"]}
+    assert image_hashes["b.com"] == "h2"
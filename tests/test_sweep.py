@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from pathlib import Path
+from collections import Counter
+
+import matchers.similarity_matcher as similarity_matcher
+from matchers.similarity_matcher import SimilarityMatcher
+
+THRESHOLDS = [0.5, 0.55, 0.6, 0.7, 0.8, 0.9]
+COLOR_THRESHOLDS = [0.3, 0.5, 0.7]
+
+
+@pytest.fixture(autouse=True)
+def no_cnn(monkeypatch):
+    monkeypatch.setattr(similarity_matcher, "CNN", lambda *a, **k: None)
+    monkeypatch.setattr(similarity_matcher, "Encoder", lambda *a, **k: None)
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    brands = rng.normal(size=(40, 64))
+    encodings = {}
+    for n in range(600):
+        v = brands[n % 40] + rng.normal(scale=0.8, size=64)
+        encodings[f"h{n}"] = (v / np.linalg.norm(v)).astype(np.float32)
+    image_map = {}
+    for n in range(600):
+        for s in range(rng.integers(1, 3)):
+            image_map[f"site{n}_{s}.com"] = Path(f"/x/h{n}.png")
+    for n in range(20):
+        image_map[f"unencoded{n}.com"] = Path(f"/x/z{n}.png")
+    colors = {k: rng.uniform(0, 255, 3) for k in list(encodings) + [f"z{n}" for n in range(20)]}
+    return encodings, image_map, colors
+
+
+def matcher(neighbors, colors, threshold=0.6, color_threshold=0.5):
+    # LSH sizes its tables from the search threshold, so fix them to compare searches at different thresholds
+    m = SimilarityMatcher(
+        threshold=threshold, color_threshold=color_threshold, neighbors=neighbors, lsh_bits=6, lsh_tables=8
+    )
+    m.color_cache.update(colors)
+    return m
+
+
+def distribution(groups):
+    return dict(sorted(Counter(len(g) for g in groups).items()))
+
+
+@pytest.mark.parametrize("neighbors", ["exact", "approx"])
+def test_sweep_matches_group_at_every_threshold(corpus, neighbors):
+    encodings, image_map, colors = corpus
+    _, results = matcher(neighbors, colors).sweep(encodings, image_map, THRESHOLDS, COLOR_THRESHOLDS)
+    assert {(r["cnn_threshold"], r["color_threshold"]) for r in results} >= {
+        (t, c) for t in THRESHOLDS for c in COLOR_THRESHOLDS
+    }
+    for r in results:
+        expected = matcher(neighbors, colors, r["cnn_threshold"], r["color_threshold"]).group(encodings, image_map)
+        assert r["sizes"] == distribution(expected), (r["cnn_threshold"], r["color_threshold"])
+
+
+@pytest.mark.parametrize("neighbors", ["exact", "approx"])
+def test_sweep_returns_the_threshold_grouping(corpus, neighbors):
+    encodings, image_map, colors = corpus
+    groups, _ = matcher(neighbors, colors, 0.65, 0.4).sweep(encodings, image_map, [0.8, 0.9], [0.6])
+    expected = matcher(neighbors, colors, 0.65, 0.4).group(encodings, image_map)
+    assert sorted(map(sorted, groups)) == sorted(map(sorted, expected))
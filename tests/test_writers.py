@@ -0,0 +1,52 @@
+import json
+import pyarrow.parquet as pq
+import pytest
+
+from utils.writers import WRITERS, JsonWriter, ParquetWriter, read_groups
+
+METADATA = {"total_input_websites": 5, "cnn_threshold": 0.75}
+
+
+def groups():
+    return [
+        {
+            "group_id": f"group_{n + 1}",
+            "size": size,
+            "websites": [
+                {"url": f"s{n}_{k}.com", "logo_url": f"https://s{n}_{k}.com/logo.png", "image_hash": f"h{n}"}
+                for k in range(size)
+            ],
+        }
+        for n, size in enumerate([3, 2, 1, 1])
+    ]
+
+
+def write(output, fmt, items, **kwargs):
+    writer = WRITERS[fmt](output, METADATA, **kwargs)
+    for g in items:
+        writer.write(g)
+    writer.close()
+    return writer
+
+
+@pytest.mark.parametrize("fmt", list(WRITERS))
+def test_round_trip(tmp_path, fmt):
+    write(tmp_path, fmt, groups(), **({"rows": 2} if fmt == "parquet" else {}))
+    assert list(read_groups(tmp_path)) == groups()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+@pytest.mark.parametrize("fmt", list(WRITERS))
+def test_empty_run(tmp_path, fmt):
+    write(tmp_path, fmt, [])
+    assert list(read_groups(tmp_path)) == []
+
+
+def test_metadata_travels_with_the_file(tmp_path):
+    write(tmp_path, "json", groups())
+    write(tmp_path, "parquet", groups())
+    assert json.loads((tmp_path / JsonWriter.name).read_text())["metadata"] == METADATA
+    schema = pq.read_schema(tmp_path / ParquetWriter.name)
+    assert json.loads(schema.metadata[b"logo_matcher"]) == METADATA
+    sizes = pq.read_table(tmp_path / ParquetWriter.name, columns=["group_size"], filters=[("group_size", ">", 1)])
+    assert len(sizes) == 5
@@ -1,73 +1,146 @@
-﻿import pandas as pd
-import logging
-from typing import List, Optional
+﻿import logging
+import hashlib
+import numpy as np
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from extractors.logo_extractor import domain_key
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+URL_COLUMNS = ['url', 'website', 'domain', 'company_domain', 'site']
+BATCH_ROWS = 64 * 1024
+
+
+def digest(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def parse_shard(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not spec:
+        return None
+    i, n = (int(x) for x in spec.split("/"))
+    if not 0 <= i < n:
+        raise ValueError(f"Shard {spec!r} must be i/N with 0 <= i < N")
+    return i, n
+
+
+def pick_column(names: List[str], url_column: str = 'domain') -> str:
+    for col in [url_column] + URL_COLUMNS:
+        if col in names:
+            return col
+    logger.warning(f"Could not find URL column. Available columns: {names}")
+    logger.info(f"Using first column: {names[0]}")
+    return names[0]
+
+
+class DigestSet:
+    def __init__(self):
+        self.runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self.runs)
+
+    def add(self, digests: np.ndarray) -> np.ndarray:
+        fresh = np.zeros(len(digests), dtype=bool)
+        if not len(digests):
+            return fresh
+        _, first = np.unique(digests, return_index=True)
+        fresh[first] = True
+        for run in self.runs:
+            pos = np.minimum(np.searchsorted(run, digests), len(run) - 1)
+            fresh &= run[pos] != digests
+
+        if not fresh.any():
+            return fresh
+        self.runs.append(np.sort(digests[fresh]))
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = np.sort(np.concatenate([self.runs[-1], last]))
+        return fresh
+
 
 class DataReader:
     @staticmethod
-    def read_parquet(filepath: str, url_column: str = 'domain') -> List[str]:
+    def rows(filepath: Path) -> Optional[int]:
         try:
-            logger.info(f"Reading Parquet file: {filepath}")
-            df = pd.read_parquet(filepath)
-            
-            logger.info(f"Loaded {len(df)} rows")
-            logger.info(f"Columns: {df.columns.tolist()}")
-            
-            possible_columns = [url_column, 'url', 'website', 'domain', 'company_domain', 'site']
-            url_col = None
-            
-            for col in possible_columns:
-                if col in df.columns:
-                    url_col = col
-                    break
-            
-            if url_col is None:
-                logger.warning(f"Could not find URL column. Available columns: {df.columns.tolist()}")
-                logger.info(f"Using first column: {df.columns[0]}")
-                url_col = df.columns[0]
-            
-            websites = df[url_col].dropna().astype(str).tolist()
-            websites = list(dict.fromkeys(websites))
-            
-            logger.info(f"Extracted {len(websites)} unique websites")
-            
-            return websites
-            
-        except Exception as e:
-            logger.error(f"Failed to read Parquet file: {e}")
-            return []
-    
+            return pq.ParquetFile(filepath).metadata.num_rows if Path(filepath).suffix == ".parquet" else None
+        except Exception:
+            return None
+
     @staticmethod
-    def read_text_file(filepath: str) -> List[str]:
+    def batches(filepath: Path, url_column: str = 'domain', batch_rows: int = BATCH_ROWS) -> Iterator[List[Optional[str]]]:
+        path = Path(filepath)
+        if path.suffix == ".parquet":
+            f = pq.ParquetFile(path)
+            col = pick_column(f.schema_arrow.names, url_column)
+            for batch in f.iter_batches(batch_size=batch_rows, columns=[col]):
+                yield batch.column(0).cast("string").to_pylist()
+        elif path.suffix == ".csv":
+            names = pacsv.open_csv(path).schema.names
+            reader = pacsv.open_csv(
+                path,
+                read_options=pacsv.ReadOptions(block_size=1 << 22),
+                convert_options=pacsv.ConvertOptions(include_columns=[pick_column(names, url_column)]),
+            )
+            for batch in reader:
+                yield batch.column(0).cast("string").to_pylist()
+        else:
+            with open(path) as f:
+                lines = []
+                for line in f:
+                    lines.append(line)
+                    if len(lines) >= batch_rows:
+                        yield lines
+                        lines = []
+                if lines:
+                    yield lines
+
+    @staticmethod
+    def stream(
+        filepath: Path,
+        url_column: str = 'domain',
+        shard: Optional[Tuple[int, int]] = None,
+        seen: Optional[DigestSet] = None,
+    ) -> Iterator[str]:
+        seen = DigestSet() if seen is None else seen
+        total = 0
         try:
-            with open(filepath, 'r') as f:
-                websites = [line.strip() for line in f if line.strip()]
-            
-            logger.info(f"Loaded {len(websites)} websites from text file")
-            return websites
-            
+            for values in DataReader.batches(filepath, url_column):
+                websites, digests = DataReader._normalize(values)
+                if shard:
+                    mine = digests % np.uint64(shard[1]) == np.uint64(shard[0])
+                    websites = [w for w, m in zip(websites, mine.tolist()) if m]
+                    digests = digests[mine]
+                for n in np.flatnonzero(seen.add(digests)).tolist():
+                    total += 1
+                    yield websites[n]
         except Exception as e:
-            logger.error(f"Failed to read text file: {e}")
-            return []
-    
+            logger.error(f"Failed to read {filepath}: {e}")
+        logger.info(f"Read {total} unique websites from {filepath}" + (f" (shard {shard[0]}/{shard[1]})" if shard else ""))
+
+    @staticmethod
+    def _normalize(values: Iterable[Optional[str]]) -> Tuple[List[str], np.ndarray]:
+        websites, digests = [], []
+        for v in values:
+            w = v.strip() if v else ""
+            key = domain_key(w) if w else None
+            if key:
+                websites.append(w)
+                digests.append(digest(key))
+        return websites, np.array(digests, dtype=np.uint64)
+
+    @staticmethod
+    def read_parquet(filepath: str, url_column: str = 'domain') -> List[str]:
+        logger.info(f"Reading Parquet file: {filepath}")
+        return list(DataReader.stream(Path(filepath), url_column))
+
+    @staticmethod
+    def read_text_file(filepath: str) -> List[str]:
+        return list(DataReader.stream(Path(filepath)))
+
     @staticmethod
     def read_csv(filepath: str, url_column: str = 'domain') -> List[str]:
-        try:
-            df = pd.read_csv(filepath)
-            
-            if url_column not in df.columns:
-                logger.warning(f"Column '{url_column}' not found. Using first column.")
-                url_column = df.columns[0]
-            
-            websites = df[url_column].dropna().astype(str).tolist()
-            websites = list(dict.fromkeys(websites))
-            
-            logger.info(f"Loaded {len(websites)} websites from CSV")
-            return websites
-            
-        except Exception as e:
-            logger.error(f"Failed to read CSV file: {e}")
-            return []
+        return list(DataReader.stream(Path(filepath), url_column))
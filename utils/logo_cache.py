@@ -0,0 +1,32 @@
+from diskcache import Cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from extractors.logo_extractor import domain_key
+
+DAY = 24 * 60 * 60
+
+
+class LogoCache:
+    def __init__(self, directory: Path, ttl: float = 7 * DAY, negative_ttl: float = DAY):
+        self.cache = Cache(str(directory))
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def get(self, website: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        key = domain_key(website)
+        if not key:
+            return None
+        return self.cache.get(key)
+
+    def put(self, website: str, found: Optional[Tuple[str, str]]):
+        key = domain_key(website)
+        if not key:
+            return
+        if found:
+            self.cache.set(key, found, expire=self.ttl)
+        else:
+            self.cache.set(key, (None, None), expire=self.negative_ttl)
+
+    def close(self):
+        self.cache.close()
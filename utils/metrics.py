@@ -0,0 +1,135 @@
+import json
+import time
+import bisect
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24)
+SIZE_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 1000, 10000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        total = 0
+        for le, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            yield ("+Inf" if le == float("inf") else f"{le:g}"), total
+
+
+class Metrics:
+    def __init__(self, prefix: str = "logo_matcher"):
+        self.prefix = prefix
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.gauges: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self.lock = Lock()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        with self.lock:
+            self.counters[name][_labels(labels)] += value
+
+    def set(self, name: str, value: float, **labels: str):
+        with self.lock:
+            self.gauges[name][_labels(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str):
+        key = _labels(labels)
+        with self.lock:
+            hist = self.histograms[name].get(key)
+            if hist is None:
+                hist = self.histograms[name][key] = Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def extraction(self, found: Optional[Tuple[str, str]], requests: Counter, seconds: float):
+        strategy = found[1] if found else "none"
+        self.inc("extract_total", strategy=strategy)
+        self.observe("extract_seconds", seconds, strategy=strategy)
+        self.observe("requests_per_domain", sum(requests.values()), COUNT_BUCKETS)
+        for kind, n in requests.items():
+            if kind == "page":
+                self.inc("http_requests_total", n, kind="page")
+            else:
+                self.inc("http_requests_total", n, kind="probe")
+                self.inc("probes_total", n, strategy=kind)
+
+    def stages(self, timings: Dict[str, Dict[str, float]]):
+        for stage, t in timings.items():
+            self.set("stage_items", t.get("items", 0), stage=stage)
+            self.set("stage_wall_seconds", t.get("wall", 0.0), stage=stage)
+            if "busy" in t:
+                self.set("stage_busy_seconds", t["busy"], stage=stage)
+            if t.get("wall"):
+                self.set("stage_throughput", round(t.get("items", 0) / t["wall"], 3), stage=stage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "counters": {n: [{"labels": dict(k), "value": v} for k, v in s.items()] for n, s in self.counters.items()},
+                "gauges": {n: [{"labels": dict(k), "value": v} for k, v in s.items()] for n, s in self.gauges.items()},
+                "histograms": {
+                    n: [
+                        {"labels": dict(k), "buckets": dict(h.cumulative()), "sum": round(h.sum, 6), "count": h.count}
+                        for k, h in s.items()
+                    ]
+                    for n, s in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, values in sorted(series.items()):
+                    full = f"{self.prefix}_{name}"
+                    lines.append(f"# TYPE {full} {kind}")
+                    lines.extend(f"{full}{_format(k)} {v:g}" for k, v in values.items())
+            for name, values in sorted(self.histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full} histogram")
+                for k, h in values.items():
+                    lines.extend(f"{full}_bucket{_format(k + (('le', le),))} {n}" for le, n in h.cumulative())
+                    lines.append(f"{full}_sum{_format(k)} {h.sum:g}")
+                    lines.append(f"{full}_count{_format(k)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: Path, prometheus: bool = False) -> Path:
+        path = directory / "metrics.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+        if prometheus:
+            (directory / "metrics.prom").write_text(self.to_prometheus())
+        return path
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
@@ -0,0 +1,101 @@
+import time
+import logging
+from queue import Queue
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DONE = object()
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Stage:
+    def __init__(
+        self,
+        fn: Callable[[Any], None],
+        workers: int = 1,
+        size: int = 1000,
+        outbox: Optional["Stage"] = None,
+        stream: bool = False,
+    ):
+        self.fn = fn
+        self.inbox: Queue = Queue(size)
+        self.outbox = outbox
+        self.stream = stream
+        self._remaining = workers
+        self._lock = Lock()
+        self.items = 0
+        self.busy = 0.0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self._threads = [Thread(target=self._work, daemon=True) for _ in range(workers)]
+
+    def start(self) -> "Stage":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def put(self, item: Any):
+        self.inbox.put(item)
+
+    def close(self):
+        self.inbox.put(DONE)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def stats(self) -> Dict[str, float]:
+        wall = self.last - self.first if self.first is not None else 0.0
+        return {"items": self.items, "busy": round(self.busy, 3), "wall": round(wall, 3)}
+
+    def _take(self) -> Iterator[Any]:
+        for item in iter(self.inbox.get, DONE):
+            with self._lock:
+                self.items += 1
+                if self.first is None:
+                    self.first = time.perf_counter()
+            yield item
+
+    def _work(self):
+        items = self._take()
+        if self.stream:
+            start = time.perf_counter()
+            try:
+                self.fn(items)
+            except Exception as e:
+                logger.error(f"Stage failed: {e}")
+                for _ in items:
+                    pass
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.busy += elapsed
+        else:
+            for item in items:
+                start = time.perf_counter()
+                try:
+                    self.fn(item)
+                except Exception as e:
+                    logger.error(f"Stage failed on {item!r}: {e}")
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.busy += elapsed
+
+        self.inbox.put(DONE)
+        with self._lock:
+            self._remaining -= 1
+            last = not self._remaining
+            self.last = time.perf_counter()
+        if last and self.outbox is not None:
+            self.outbox.close()
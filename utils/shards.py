@@ -0,0 +1,50 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "_SUCCESS"
+PARTIAL = "partial.json"
+
+
+def shard_dir(output: Path, shard: Tuple[int, int]) -> Path:
+    return output / "shards" / f"{shard[0]}-of-{shard[1]}"
+
+
+def start(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / SUCCESS).unlink(missing_ok=True)
+
+
+def finish(directory: Path, partial: Dict[str, Any]):
+    tmp = directory / f"{PARTIAL}.tmp"
+    tmp.write_text(json.dumps(partial))
+    os.replace(tmp, directory / PARTIAL)
+    (directory / SUCCESS).touch()
+
+
+def collect(output: Path, wait: float = 0.0, poll: float = 10.0) -> Optional[List[Path]]:
+    deadline = time.time() + wait
+    while True:
+        dirs = sorted((output / "shards").glob("*-of-*"))
+        counts = {d.name.split("-of-")[1] for d in dirs}
+        if len(counts) > 1:
+            logger.error(f"Shards in {output} were run with different counts: {sorted(counts)}")
+            return None
+
+        total = int(counts.pop()) if counts else 0
+        done = [d for d in dirs if (d / SUCCESS).exists()]
+        if total and len(done) == total:
+            return done
+        if time.time() >= deadline:
+            logger.error(f"{len(done)}/{total or '?'} shards complete in {output / 'shards'}")
+            return None
+        time.sleep(min(poll, max(deadline - time.time(), 0)))
+
+
+def load(directory: Path) -> Dict[str, Any]:
+    return json.loads((directory / PARTIAL).read_text())
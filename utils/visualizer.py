@@ -1,52 +1,160 @@
+import html
 from pathlib import Path
+from PIL import Image, features
+from typing import Any, Dict, Iterable, List
+
+from processors.image_processor import IMAGE_EXT
+
+THUMB_SIZE = 96
+THUMB_EXT = ".webp" if features.check("webp") else ".png"
+PLACEHOLDER = (
+    "data:image/svg+xml,%3Csvg xmlns=%27http://www.w3.org/2000/svg%27 width=%2796%27 height=%2780%27%3E"
+    "%3Crect width=%2796%27 height=%2780%27 fill=%27%23eee%27/%3E%3Ctext x=%2748%27 y=%2744%27 font-size=%2711%27 "
+    "text-anchor=%27middle%27 fill=%27%23999%27%3ENo image%3C/text%3E%3C/svg%3E"
+)
+STYLE = """body { font-family: sans-serif; padding: 20px; background: #f5f5f5; }
+.header { background: white; padding: 20px; border-radius: 8px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+.group { background: white; padding: 20px; margin-bottom: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+.group-header { border-bottom: 1px solid #eee; padding-bottom: 10px; margin-bottom: 15px; font-weight: bold; color: #333; display: flex; justify-content: space-between; }
+.grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(150px, 1fr)); gap: 15px; }
+.card { text-align: center; border: 1px solid #eee; padding: 10px; border-radius: 4px; transition: transform 0.2s; }
+.card:hover { transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.1); }
+.card img { max-width: 100%; height: 80px; object-fit: contain; margin-bottom: 8px; }
+.domain { font-size: 11px; color: #666; word-break: break-all; }
+.domain a { color: inherit; text-decoration: none; }
+.meta { color: #666; font-size: 14px; margin-top: 5px; }
+.more { color: #999; font-size: 13px; margin-top: 10px; }
+.nav { margin: 10px 0 20px; }
+.nav a { margin-right: 12px; }
+table { border-collapse: collapse; background: white; }
+td, th { padding: 4px 12px; border-bottom: 1px solid #eee; text-align: left; }
+"""
+
 
 class Visualizer:
-    def __init__(self, output_dir: Path):
+    def __init__(self, output_dir: Path, page_size: int = 100, max_cards: int = 48):
         self.output_dir = output_dir
         self.report_path = output_dir / "report.html"
+        self.pages_dir = output_dir / "report"
+        self.thumbs_dir = output_dir / "thumbs"
+        self.images_dir = output_dir / "images"
+        self.page_size = page_size
+        self.max_cards = max_cards
 
-    def generate(self, groups: list, total_websites: int):
-        html = [
-            "<!DOCTYPE html>",
-            "<html>",
-            "<head>",
-            "<title>Logo Similarity Report</title>",
-            "<style>",
-            "body { font-family: sans-serif; padding: 20px; background: #f5f5f5; }",
-            ".header { background: white; padding: 20px; border-radius: 8px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }",
-            ".group { background: white; padding: 20px; margin-bottom: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }",
-            ".group-header { border-bottom: 1px solid #eee; padding-bottom: 10px; margin-bottom: 15px; font-weight: bold; color: #333; display: flex; justify-content: space-between; }",
-            ".grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(150px, 1fr)); gap: 15px; }",
-            ".card { text-align: center; border: 1px solid #eee; padding: 10px; border-radius: 4px; transition: transform 0.2s; }",
-            ".card:hover { transform: translateY(-2px); box-shadow: 0 4px 8px rgba(0,0,0,0.1); }",
-            ".card img { max-width: 100%; height: 80px; object-fit: contain; margin-bottom: 8px; }",
-            ".domain { font-size: 11px; color: #666; word-break: break-all; }",
-            ".meta { color: #666; font-size: 14px; margin-top: 5px; }",
-            "</style>",
-            "</head>",
-            "<body>",
-            f"<div class='header'><h1>Logo Similarity Results</h1><div class='meta'>Processed {total_websites} websites • Found {len(groups)} groups</div></div>"
-        ]
+    def generate(self, groups: Iterable[Dict[str, Any]], total_websites: int) -> Path:
+        if isinstance(groups, list):
+            groups = sorted(groups, key=lambda g: g["size"], reverse=True)
+        self.pages_dir.mkdir(exist_ok=True)
+        self.thumbs_dir.mkdir(exist_ok=True)
+        (self.pages_dir / "style.css").write_text(STYLE)
+        for old in self.pages_dir.glob("page-*.html"):
+            old.unlink()
 
+        pages: List[Dict[str, Any]] = []
+        page: List[Dict[str, Any]] = []
         for group in groups:
-            html.append(f"<div class='group'>")
-            html.append(f"<div class='group-header'><span>{group[0]['group_id'].upper()}</span> <span>Size: {group[0]['size']}</span></div>")
-            html.append(f"<div class='grid'>")
-            
-            for item in group[0]['websites']:
-                url = item['url']
-                safe_name = url.replace("https://", "").replace("http://", "").replace("/", "_").replace(":", "_").replace("?", "_")
-                img_path = f"images/{safe_name}.jpg"
-                
-                html.append(f"""
-                <div class='card'>
-                    <a href='{img_path}' target='_blank'><img src='{img_path}' loading='lazy' onerror="this.src='https://placehold.co/100x80?text=No+Image'"></a>
-                    <div class='domain'><a href='{url}' target='_blank' style='color: inherit; text-decoration: none;'>{url}</a></div>
-                </div>
-                """)
-            
-            html.append("</div></div>")
-
-        html.append("</body></html>")
-        self.report_path.write_text("\n".join(html), encoding="utf-8")
-        return self.report_path
\ No newline at end of file
+            page.append(group)
+            if len(page) >= self.page_size:
+                pages.append(self._page(page, len(pages) + 1))
+                page = []
+        if page:
+            pages.append(self._page(page, len(pages) + 1))
+
+        for p in pages:
+            self._nav(p, len(pages))
+        self._index(pages, total_websites)
+        return self.report_path
+
+    def thumbnail(self, digest: str) -> str:
+        thumb = self.thumbs_dir / f"{digest}{THUMB_EXT}"
+        if not thumb.exists():
+            try:
+                with Image.open(self.images_dir / f"{digest}{IMAGE_EXT}") as img:
+                    img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+                    tmp = thumb.with_name(f"{thumb.stem}.tmp{THUMB_EXT}")
+                    img.save(tmp, quality=80)
+                    tmp.replace(thumb)
+            except Exception:
+                return PLACEHOLDER
+        return f"../thumbs/{thumb.name}"
+
+    def _page(self, groups: List[Dict[str, Any]], number: int) -> Dict[str, Any]:
+        path = self.pages_dir / f"page-{number:04d}.html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                "<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8'>\n"
+                f"<title>Logo Similarity Report - page {number}</title>\n"
+                "<link rel='stylesheet' href='style.css'>\n</head>\n<body>\n<!--nav-->\n"
+            )
+            for group in groups:
+                f.write(self._group(group))
+            f.write("<!--nav-->\n</body></html>\n")
+        return {
+            "path": path,
+            "number": number,
+            "groups": len(groups),
+            "first": groups[0]["group_id"],
+            "last": groups[-1]["group_id"],
+            "largest": groups[0]["size"],
+            "smallest": groups[-1]["size"],
+            "top": [(g["group_id"], g["size"]) for g in groups if g["size"] > 1][:10],
+        }
+
+    def _group(self, group: Dict[str, Any]) -> str:
+        gid = html.escape(group["group_id"])
+        out = [
+            f"<div class='group' id='{gid}'>",
+            f"<div class='group-header'><span>{gid.upper()}</span> <span>Size: {group['size']}</span></div>",
+            "<div class='grid'>",
+        ]
+        for item in group["websites"][: self.max_cards]:
+            url = html.escape(item["url"], quote=True)
+            digest = item.get("image_hash")
+            thumb = self.thumbnail(digest) if digest else PLACEHOLDER
+            full = f"../images/{digest}{IMAGE_EXT}" if digest else thumb
+            out.append(
+                f"<div class='card'><a href='{full}' target='_blank'>"
+                f"<img src='{thumb}' loading='lazy' width='{THUMB_SIZE}' onerror=\"this.onerror=null;this.src='{PLACEHOLDER}'\"></a>"
+                f"<div class='domain'><a href='{url}' target='_blank'>{url}</a></div></div>"
+            )
+        out.append("</div>")
+        hidden = len(group["websites"]) - self.max_cards
+        if hidden > 0:
+            out.append(f"<div class='more'>+{hidden} more websites not shown</div>")
+        out.append("</div>\n")
+        return "\n".join(out)
+
+    def _nav(self, page: Dict[str, Any], count: int):
+        n = page["number"]
+        links = ["<a href='../report.html'>Index</a>"]
+        if n > 1:
+            links.append(f"<a href='page-{n - 1:04d}.html'>&larr; Page {n - 1}</a>")
+        links.append(f"<span>Page {n} of {count}</span>")
+        if n < count:
+            links.append(f"<a href='page-{n + 1:04d}.html'>Page {n + 1} &rarr;</a>")
+        nav = f"<div class='nav'>{' '.join(links)}</div>"
+        text = page["path"].read_text(encoding="utf-8")
+        page["path"].write_text(text.replace("<!--nav-->", nav), encoding="utf-8")
+
+    def _index(self, pages: List[Dict[str, Any]], total_websites: int):
+        groups = sum(p["groups"] for p in pages)
+        rows = [
+            f"<tr><td><a href='report/{p['path'].name}'>Page {p['number']}</a></td>"
+            f"<td>{html.escape(p['first'])} – {html.escape(p['last'])}</td><td>{p['largest']} – {p['smallest']}</td></tr>"
+            for p in pages
+        ]
+        top = [
+            f"<tr><td><a href='report/{p['path'].name}#{html.escape(gid)}'>{html.escape(gid)}</a></td><td>{size}</td></tr>"
+            for p in pages
+            for gid, size in p["top"]
+        ][:50]
+        self.report_path.write_text(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8'>\n<title>Logo Similarity Report</title>\n"
+            "<link rel='stylesheet' href='report/style.css'>\n</head>\n<body>\n"
+            f"<div class='header'><h1>Logo Similarity Results</h1><div class='meta'>Processed {total_websites} websites • "
+            f"Found {groups} groups • {len(pages)} pages of up to {self.page_size} groups, largest first</div></div>\n"
+            "<h2>Largest groups</h2>\n<table><tr><th>Group</th><th>Size</th></tr>\n" + "\n".join(top) + "\n</table>\n"
+            "<h2>Pages</h2>\n<table><tr><th>Page</th><th>Groups</th><th>Sizes</th></tr>\n" + "\n".join(rows) + "\n</table>\n"
+            "</body></html>\n",
+            encoding="utf-8",
+        )
@@ -0,0 +1,102 @@
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+SCHEMA = pa.schema([
+    ("group_id", pa.string()),
+    ("group_size", pa.int32()),
+    ("url", pa.string()),
+    ("logo_url", pa.string()),
+    ("image_hash", pa.string()),
+])
+
+
+class JsonWriter:
+    name = "logo_groups.json"
+
+    def __init__(self, output: Path, metadata: Dict[str, Any]):
+        self.path = output / self.name
+        self.f = open(self.path.with_name(self.path.name + ".tmp"), "w")
+        self.f.write('{\n  "metadata": ' + json.dumps(metadata) + ',\n  "groups": [')
+        self.first = True
+
+    def write(self, group: Dict[str, Any]):
+        self.f.write(("\n    " if self.first else ",\n    ") + json.dumps(group))
+        self.first = False
+
+    def close(self):
+        self.f.write("\n  ]\n}\n")
+        self.f.close()
+        self.path.with_name(self.path.name + ".tmp").replace(self.path)
+
+
+class NdjsonWriter:
+    name = "logo_groups.ndjson"
+
+    def __init__(self, output: Path, metadata: Dict[str, Any]):
+        self.path = output / self.name
+        self.f = open(self.path.with_name(self.path.name + ".tmp"), "w")
+
+    def write(self, group: Dict[str, Any]):
+        self.f.write(json.dumps(group) + "\n")
+
+    def close(self):
+        self.f.close()
+        self.path.with_name(self.path.name + ".tmp").replace(self.path)
+
+
+class ParquetWriter:
+    name = "logo_groups.parquet"
+
+    def __init__(self, output: Path, metadata: Dict[str, Any], rows: int = 64 * 1024):
+        self.path = output / self.name
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.schema = SCHEMA.with_metadata({"logo_matcher": json.dumps(metadata)})
+        self.writer = pq.ParquetWriter(self.tmp, self.schema, compression="zstd")
+        self.rows = rows
+        self.columns: Dict[str, List[Any]] = {f.name: [] for f in SCHEMA}
+
+    def write(self, group: Dict[str, Any]):
+        for site in group["websites"]:
+            self.columns["group_id"].append(group["group_id"])
+            self.columns["group_size"].append(group["size"])
+            self.columns["url"].append(site["url"])
+            self.columns["logo_url"].append(site["logo_url"])
+            self.columns["image_hash"].append(site["image_hash"])
+        if len(self.columns["url"]) >= self.rows:
+            self.flush()
+
+    def flush(self):
+        if self.columns["url"]:
+            self.writer.write_table(pa.table(self.columns, schema=self.schema))
+            self.columns = {f.name: [] for f in SCHEMA}
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        self.tmp.replace(self.path)
+
+
+WRITERS = {"json": JsonWriter, "ndjson": NdjsonWriter, "parquet": ParquetWriter}
+
+
+def read_groups(output: Path) -> Iterator[Dict[str, Any]]:
+    if (output / NdjsonWriter.name).exists():
+        with open(output / NdjsonWriter.name) as f:
+            for line in f:
+                yield json.loads(line)
+    elif (output / ParquetWriter.name).exists():
+        group = None
+        for batch in pq.ParquetFile(output / ParquetWriter.name).iter_batches():
+            for row in batch.to_pylist():
+                if group is None or row["group_id"] != group["group_id"]:
+                    if group:
+                        yield group
+                    group = {"group_id": row["group_id"], "size": row["group_size"], "websites": []}
+                group["websites"].append({k: row[k] for k in ("url", "logo_url", "image_hash")})
+        if group:
+            yield group
+    elif (output / JsonWriter.name).exists():
+        yield from json.loads((output / JsonWriter.name).read_text())["groups"]